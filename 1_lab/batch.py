@@ -0,0 +1,163 @@
+import argparse
+import json
+import multiprocessing
+import sys
+from collections import OrderedDict
+import solution
+from heap import HeapQueue, IndexedHeap
+
+
+parser = argparse.ArgumentParser(
+    description='answer many queries against one loaded state space; each query line is '
+                '"start: goal goal ...: alg", where goals default to the descriptor goals and '
+                'alg defaults to --alg')
+parser.add_argument('queries', metavar='queries_path', nargs='?', default='-',
+                    help='path to query file (default: stdin)')
+parser.add_argument('--ss', metavar='ssd_path', required=True, nargs=1,
+                    help='path to state space descriptor file')
+parser.add_argument('--h', metavar='hd_path', nargs=1,
+                    help='path to heuristic descriptor file')
+parser.add_argument('--alg', default='ucs', choices=list(solution.HEADERS.keys()),
+                    help='algorithm for queries that do not name one (default: ucs)')
+parser.add_argument('--cache', metavar='cache_dir', nargs=1,
+                    help='directory for compiled, memory-mapped copies of the descriptor files')
+parser.add_argument('--jobs', type=int, default=1,
+                    help='number of worker processes')
+parser.add_argument('--tree-cache', metavar='mb', type=float, default=0,
+                    help='megabytes of shortest-path trees kept per worker for repeated ucs start states '
+                         '(default: 0, disabled)')
+parser.add_argument('--budget', metavar='nodes', type=int,
+                    help='maximum number of nodes kept in memory by smastar')
+parser.add_argument('--open-list', default='heapq', choices=['heapq', 'indexed'],
+                    help='open list for ucs and astar (values: heapq, or indexed with decrease-key)')
+
+# Loaded once in the parent; workers are forked and share it read-only.
+context = {}
+
+
+class TreeCache:
+    # Shortest-path trees of ucs start states, built only once a start
+    # repeats; the least recently used trees are dropped when they hold more
+    # than limit bytes. A one-off start costs a plain ucs query.
+    def __init__(self, limit):
+        self.limit = limit
+        self.trees = OrderedDict()
+        self.seen = set()
+        self.size = 0
+
+    def get(self, start):
+        tree = self.trees.get(start)
+        if tree is not None:
+            self.trees.move_to_end(start)
+            return tree
+        if start not in self.seen:
+            self.seen.add(start)
+            return None
+
+        tree = solution.ucs_tree(start, context['graph'], context['open_list'])
+        size = sum(a.itemsize * len(a) for a in tree)
+        if size <= self.limit:
+            self.trees[start] = tree
+            self.size += size
+            while self.size > self.limit:
+                self.size -= sum(a.itemsize * len(a) for a in self.trees.popitem(last=False)[1])
+        return tree
+
+
+def ucs_cached(tree, goals):
+    cost, parent, order = tree
+    reached = [(order[g], g) for g in goals if order[g] != -1]
+    if not reached:
+        raise solution.NotFound()
+    rank, goal = min(reached)
+    return cost[goal], rank + 1, solution.path_ids(parent, goal), None
+
+
+def answer(query):
+    i, line = query
+    graph = context['graph']
+    fields = [f.strip() for f in line.split(':')]
+    start, goals = fields[0], fields[1].split() if len(fields) > 1 else []
+    alg = fields[2] if len(fields) > 2 and fields[2] else context['alg']
+    res = {'query': i, 'start': start, 'alg': alg}
+
+    try:
+        if alg not in solution.HEADERS:
+            raise ValueError(f'unknown algorithm {alg}')
+        if alg in solution.HEURISTIC_ALGS and context['h'] is None:
+            raise ValueError('heuristic descriptor file not provided')
+        if alg == 'smastar' and (context['budget'] is None or context['budget'] < 2):
+            raise ValueError('node budget for smastar not provided or below 2')
+        init_state = graph.id(start)
+        if goals:
+            goal_ids = [graph.id(g) for g in goals]
+            goal_states = graph.mask(goal_ids)
+        else:
+            goal_states, goal_ids = context['goal_states'], context['goal_ids']
+    except KeyError as e:
+        res['error'] = f'unknown state {e.args[0]}'
+        return json.dumps(res)
+    except ValueError as e:
+        res['error'] = str(e)
+        return json.dumps(res)
+
+    try:
+        tree = None
+        if alg == 'ucs' and context['trees'] is not None:
+            tree = context['trees'].get(init_state)
+        if tree is not None:
+            cost, visited, path, peak = ucs_cached(tree, goal_ids)
+        else:
+            cost, visited, path, peak = solution.search(alg, init_state, goal_states, graph, context['h'],
+                                                        context['open_list'], context['budget'])
+    except solution.NotFound:
+        res['found'] = False
+        return json.dumps(res)
+    except Exception as e:
+        # one failing query must not end the stream or the pool
+        res['error'] = f'{type(e).__name__}: {e}'
+        return json.dumps(res)
+
+    res.update({'found': True, 'states_visited': visited, 'path_length': len(path),
+                'total_cost': cost, 'path': [graph.name(s) for s in path]})
+    if peak is not None:
+        res['peak_frontier'] = peak
+    return json.dumps(res)
+
+
+def read_queries(file):
+    for i, line in enumerate(file, start=1):
+        if line.strip() and not line.startswith('#'):
+            yield i, line.rstrip('\n')
+
+
+def main():
+    args = parser.parse_args()
+    cache_dir = args.cache[0] if args.cache is not None else None
+    try:
+        graph_key, init_state, goal_states, graph = solution.load_ss(args.ss[0], cache_dir)
+        h = solution.load_hd(args.h[0], graph, graph_key, cache_dir, search=True) if args.h is not None else None
+    except OSError as e:
+        print(f"Descriptor file {e.filename} does not exist.")
+        exit(1)
+
+    context.update(graph=graph, goal_states=goal_states, h=h, alg=args.alg, budget=args.budget,
+                   goal_ids=[g for g in range(len(graph)) if goal_states[g]],
+                   open_list=HeapQueue if args.open_list == 'heapq' else IndexedHeap, trees=None)
+    if args.tree_cache > 0:
+        context['trees'] = TreeCache(args.tree_cache * 2 ** 20)
+
+    file = sys.stdin if args.queries == '-' else open(args.queries, 'r', encoding='utf8')
+    with file:
+        queries = read_queries(file)
+        if args.jobs <= 1:
+            for res in map(answer, queries):
+                print(res, flush=True)
+            return
+        with multiprocessing.get_context('fork').Pool(args.jobs) as pool:
+            for res in pool.imap(answer, queries, chunksize=16):
+                print(res, flush=True)
+
+
+if __name__ == '__main__':
+    main()
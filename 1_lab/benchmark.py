@@ -0,0 +1,215 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+import solution
+from graph import Graph
+from heap import HeapQueue, IndexedHeap
+
+
+parser = argparse.ArgumentParser(description='benchmark the search algorithms on seeded synthetic state spaces')
+parser.add_argument('--kind', nargs='+', default=['grid', 'geometric', 'tree'],
+                    choices=['grid', 'geometric', 'tree'],
+                    help='state space generators to run')
+parser.add_argument('--sizes', metavar='n', type=int, nargs='+', default=[1000, 10000],
+                    help='approximate number of states per generated space')
+parser.add_argument('--alg', nargs='+', default=['bfs', 'ucs', 'astar'],
+                    choices=list(solution.HEADERS.keys()),
+                    help='algorithms to benchmark')
+parser.add_argument('--open-list', nargs='+', default=['heapq'], choices=['heapq', 'indexed'],
+                    help='open lists to benchmark ucs-like algorithms with')
+parser.add_argument('--budget', metavar='nodes', type=int, default=10000,
+                    help='node budget for smastar')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--repeat', type=int, default=1,
+                    help='runs per configuration')
+parser.add_argument('--workdir', metavar='dir',
+                    help='where generated descriptors are written (default: a temporary directory)')
+parser.add_argument('--out', metavar='results_path', default='benchmark.json',
+                    help='JSON file the results are written to')
+
+
+def grid(n, rng):
+    # 4-connected grid with ~20% walls and costs 1-3; manhattan distance to
+    # the nearest goal is consistent because every step costs at least 1
+    w = max(2, math.isqrt(n))
+    cells = {(x, y) for x in range(w) for y in range(w) if rng.random() > 0.2}
+    cells |= {(0, 0), (w - 1, w - 1), (w - 1, 0)}
+    # a random monotone walk from the start to the far corner is kept free
+    # of walls, so at least one goal is always reachable
+    x = y = 0
+    while (x, y) != (w - 1, w - 1):
+        if y == w - 1 or (x < w - 1 and rng.random() < 0.5):
+            x += 1
+        else:
+            y += 1
+        cells.add((x, y))
+    goals = [(w - 1, w - 1), (w - 1, 0)]
+    transitions = {}
+    for x, y in cells:
+        transitions[f'g{x}_{y}'] = [(f'g{x + dx}_{y + dy}', rng.randint(1, 3))
+                                    for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                                    if (x + dx, y + dy) in cells]
+    h = {f'g{x}_{y}': float(min(abs(x - gx) + abs(y - gy) for gx, gy in goals)) for x, y in cells}
+    return 'g0_0', [f'g{x}_{y}' for x, y in goals], transitions, h
+
+
+def geometric(n, rng):
+    # points in the unit square joined within a radius that keeps the graph
+    # connected w.h.p.; costs are distances rounded up and h is the distance
+    # to the nearest goal rounded down, which keeps h consistent
+    r = math.sqrt(2.0 * math.log(n) / n)
+    pts = [(rng.random(), rng.random()) for _ in range(n)]
+    cell = {}
+    for i, (x, y) in enumerate(pts):
+        cell.setdefault((int(x / r), int(y / r)), []).append(i)
+
+    transitions = {}
+    for i, (x, y) in enumerate(pts):
+        cx, cy = int(x / r), int(y / r)
+        near = [j for dx in (-1, 0, 1) for dy in (-1, 0, 1) for j in cell.get((cx + dx, cy + dy), ())]
+        transitions[f'p{i}'] = [(f'p{j}', (math.ceil(1e6 * math.dist(pts[i], pts[j])) + 1) / 1000)
+                                for j in near if j != i and math.dist(pts[i], pts[j]) <= r]
+    # goals come from the half of the points farthest from the start, which
+    # is never among them
+    init = min(range(n), key=lambda i: sum(pts[i]))
+    far = sorted((i for i in range(n) if i != init), key=lambda i: math.dist(pts[i], pts[init]))
+    goals = rng.sample(far[len(far) // 2:], 2)
+    h = {f'p{i}': math.floor(1e6 * min(math.dist(pts[i], pts[g]) for g in goals)) / 1000 for i in range(n)}
+    return f'p{init}', [f'p{g}' for g in goals], transitions, h
+
+
+def tree(n, rng):
+    # random tree grown from the root with goals among the leaves; half the
+    # true cost to go (inf where no goal is reachable) is consistent
+    transitions = {'t0': []}
+    for i in range(1, n):
+        transitions[f't{rng.randrange(i)}'].append((f't{i}', rng.randint(1, 9)))
+        transitions[f't{i}'] = []
+    leaves = [s for s, ch in transitions.items() if not ch]
+    goals = rng.sample(leaves, min(3, len(leaves)))
+
+    rows = {s: ' '.join(f'{t},{c}' for t, c in ch) for s, ch in transitions.items()}
+    graph = Graph.from_rows(rows, goals)
+    h_star = solution.true_costs(graph.mask(map(graph.id, goals)), graph)
+    h = {graph.name(i): c / 2 for i, c in enumerate(h_star)}
+    return 't0', goals, transitions, h
+
+
+GENERATORS = {'grid': grid, 'geometric': geometric, 'tree': tree}
+
+
+def write_descriptors(path, init_state, goals, transitions, h):
+    with open(path + '.txt', 'w', encoding='utf8') as file:
+        file.write(f'{init_state}\n{" ".join(goals)}\n')
+        for s, children in sorted(transitions.items()):
+            file.write(f'{s}: {" ".join(f"{t},{c}" for t, c in children)}\n')
+    with open(path + '_h.txt', 'w', encoding='utf8') as file:
+        for s, cost in sorted(h.items()):
+            file.write(f'{s}: {cost}\n')
+
+
+class CountingOpenList:
+    # wraps an open list class and counts pushes and pops on every queue it creates
+    def __init__(self, open_list):
+        self.open_list = open_list
+        self.pushes = self.pops = 0
+
+    def __call__(self, space):
+        return CountingQueue(self, self.open_list(space))
+
+
+class CountingQueue:
+    def __init__(self, counter, queue):
+        self.counter = counter
+        self.queue = queue
+
+    def __len__(self):
+        return len(self.queue)
+
+    def push(self, entry):
+        self.counter.pushes += 1
+        self.queue.push(entry)
+
+    def peek(self):
+        return self.queue.peek()
+
+    def pop(self):
+        self.counter.pops += 1
+        return self.queue.pop()
+
+
+def run(path, alg, open_list, budget):
+    # Runs in a fresh process. Peak RSS also counts the interpreter, numpy
+    # and the parsed descriptors, so the search is run a second time under
+    # tracemalloc for the peak memory it allocates itself; the timed run is
+    # not traced.
+    with open(path + '.txt', 'r', encoding='utf8') as file:
+        init_state, goal_states, graph = solution.parse_ss_file(file)
+    with open(path + '_h.txt', 'r', encoding='utf-8') as file:
+        h = graph.estimates(solution.parse_hd_file(file), 0.0)
+    counter = CountingOpenList(HeapQueue if open_list == 'heapq' else IndexedHeap)
+
+    res = {'states': len(graph), 'transitions': len(graph.targets)}
+    start = time.perf_counter()
+    try:
+        cost, visited, path_ids, peak = solution.search(alg, init_state, goal_states, graph, h, counter, budget)
+        res.update(found=True, total_cost=cost, path_length=len(path_ids))
+    except solution.NotFound as e:
+        visited, peak = e.visited, e.peak
+        res.update(found=False)
+    res['wall_time'] = time.perf_counter() - start
+    res['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    try:
+        solution.search(alg, init_state, goal_states, graph, h, CountingOpenList(counter.open_list), budget)
+    except solution.NotFound:
+        pass
+    res['search_alloc_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+    tracemalloc.stop()
+    res.update(expansions=visited, peak_frontier=peak)
+    if alg in ('ucs', 'astar', 'bidir', 'bidir-astar'):
+        res.update(heap_pushes=counter.pushes, heap_pops=counter.pops)
+        if alg in ('ucs', 'astar'):
+            res['stale_pops'] = counter.pops - visited
+    return res
+
+
+def main():
+    args = parser.parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix='ss-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    ctx = multiprocessing.get_context('spawn')
+
+    results = []
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for kind in args.kind:
+            for size in args.sizes:
+                rng = random.Random(f'{args.seed}-{kind}-{size}')
+                path = os.path.join(workdir, f'{kind}_{size}_{args.seed}')
+                write_descriptors(path, *GENERATORS[kind](size, rng))
+
+                for alg in args.alg:
+                    for open_list in args.open_list if alg not in ('bfs', 'idastar', 'smastar') else ['heapq']:
+                        for i in range(args.repeat):
+                            res = pool.apply(run, (path, alg, open_list, args.budget))
+                            res.update(kind=kind, size=size, seed=args.seed, alg=alg, open_list=open_list, run=i)
+                            results.append(res)
+                            print(f"{kind:>9} {size:>8} {alg:>11} {open_list:>7} "
+                                  f"{res['wall_time']:9.3f}s {res['search_alloc_kb']:>8}KB "
+                                  f"expanded={res['expansions']} pushes={res.get('heap_pushes')} "
+                                  f"stale={res.get('stale_pops')}")
+
+    with open(args.out, 'w', encoding='utf8') as file:
+        json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from graph import Graph
+
+# Compiled descriptors are stored as <sha256 of the source>.ssg (graph) and
+# <graph key>-<sha256 of the heuristic>.hdg next to each other. Every field
+# is 8 bytes wide, so the arrays can be used straight from the mapping. A
+# .hdg holds the estimates twice: with nan for the checks, then with 0 for
+# the searches, so neither needs a private copy.
+SS_MAGIC, HD_MAGIC = b'SSGRAPH1', b'SSHEUR02'
+SS_HEADER = struct.Struct('<8s5q')
+HD_HEADER = struct.Struct('<8sq')
+# maps a file's stat (device, inode, size, mtime, ctime) to its content hash
+STAT_INDEX = 'stat-index.json'
+
+
+class Names:
+    # sorted state names read lazily from a utf-8 blob
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf8')
+
+
+def file_key(path, cache_dir):
+    # the sha256 of the file, reused from the stat index while the file's
+    # stat is unchanged so a large descriptor is not read on every run
+    st = os.stat(path)
+    inode = f'{st.st_dev}:{st.st_ino}'
+    stat = f'{inode}:{st.st_size}:{st.st_mtime_ns}:{st.st_ctime_ns}'
+    index_path = os.path.join(cache_dir, STAT_INDEX)
+    try:
+        with open(index_path, 'r', encoding='utf8') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        index = {}
+    if stat in index:
+        return index[stat]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    index = {k: v for k, v in index.items() if not k.startswith(inode + ':')}
+    index[stat] = digest.hexdigest()
+    tmp = f'{index_path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf8') as file:
+        json.dump(index, file)
+    os.replace(tmp, index_path)
+    return index[stat]
+
+
+def load_ss(path, cache_dir, parse):
+    key = file_key(path, cache_dir)
+    cached = os.path.join(cache_dir, key + '.ssg')
+    if not os.path.exists(cached):
+        with open(path, 'r', encoding='utf8') as file:
+            init_state, goal_states, graph = parse(file)
+        write_ss(cached, init_state, goal_states, graph)
+    return (key,) + read_ss(cached)
+
+
+def load_hd(path, graph_key, graph, cache_dir, parse, search=False):
+    cached = os.path.join(cache_dir, f'{graph_key}-{file_key(path, cache_dir)}.hdg')
+    if os.path.exists(cached):
+        try:
+            return read_hd(cached, len(graph), search)
+        except ValueError:
+            pass  # written by an older layout
+    with open(path, 'r', encoding='utf-8') as file:
+        state_est_cost = parse(file)
+    write_hd(cached, graph, state_est_cost)
+    return read_hd(cached, len(graph), search)
+
+
+def write_ss(path, init_state, goal_states, graph):
+    goals = array('q', (i for i in range(len(graph)) if goal_states[i]))
+    names = [name.encode('utf8') for name in graph.names]
+    name_offsets = array('q', [0])
+    for name in names:
+        name_offsets.append(name_offsets[-1] + len(name))
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as file:
+        file.write(SS_HEADER.pack(SS_MAGIC, len(graph), len(graph.targets), init_state,
+                                  len(goals), name_offsets[-1]))
+        for a in (graph.offsets, graph.targets, graph.costs, goals, name_offsets):
+            file.write(a.tobytes())
+        file.writelines(names)
+    os.replace(tmp, path)
+
+
+def read_ss(path):
+    with open(path, 'rb') as file:
+        buf = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+    magic, n, m, init_state, goals, blob = SS_HEADER.unpack_from(buf)
+    if magic != SS_MAGIC:
+        raise ValueError(f'{path} is not a compiled state space descriptor')
+
+    pos = SS_HEADER.size
+    fields = []
+    for count, code in ((n + 1, 'q'), (m, 'q'), (m, 'd'), (goals, 'q'), (n + 1, 'q')):
+        fields.append(buf[pos:pos + 8 * count].cast(code))
+        pos += 8 * count
+    offsets, targets, costs, goals, name_offsets = fields
+
+    graph = Graph(Names(name_offsets, buf[pos:pos + blob]), offsets, targets, costs)
+    return init_state, graph.mask(goals), graph
+
+
+def write_hd(path, graph, state_est_cost):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as file:
+        file.write(HD_HEADER.pack(HD_MAGIC, len(graph)))
+        file.write(graph.estimates(state_est_cost).tobytes())
+        file.write(graph.estimates(state_est_cost, 0.0).tobytes())
+    os.replace(tmp, path)
+
+
+def read_hd(path, n, search=False):
+    with open(path, 'rb') as file:
+        buf = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+    magic, count = HD_HEADER.unpack_from(buf)
+    if magic != HD_MAGIC or count != n:
+        raise ValueError(f'{path} is not a compiled heuristic for this state space')
+    start = HD_HEADER.size + (8 * n if search else 0)
+    return buf[start:start + 8 * n].cast('d')
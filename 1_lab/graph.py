@@ -0,0 +1,95 @@
+import math
+from array import array
+from bisect import bisect_left
+
+
+class Graph:
+    # State names are sorted and interned to their position, so comparing
+    # ids orders states exactly like comparing their names.
+    def __init__(self, names, offsets, targets, costs):
+        self.names = names
+        self.offsets = offsets
+        self.targets = targets
+        self.costs = costs
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        i = bisect_left(self.names, name)
+        return i < len(self.names) and self.names[i] == name
+
+    def id(self, name):
+        i = bisect_left(self.names, name)
+        if i == len(self.names) or self.names[i] != name:
+            raise KeyError(name)
+        return i
+
+    def name(self, i):
+        return self.names[i]
+
+    def successors(self, i):
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return zip(self.targets[lo:hi], self.costs[lo:hi])
+
+    def reversed(self):
+        n = len(self)
+        offsets = array('q', [0]) * (n + 1)
+        for t in self.targets:
+            offsets[t + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+
+        fill = offsets[:-1]
+        targets = array('q', [0]) * len(self.targets)
+        costs = array('d', [0.0]) * len(self.costs)
+        for s in range(n):
+            for k in range(self.offsets[s], self.offsets[s + 1]):
+                j = fill[self.targets[k]]
+                fill[self.targets[k]] += 1
+                targets[j] = s
+                costs[j] = self.costs[k]
+        return Graph(self.names, offsets, targets, costs)
+
+    def table(self, typecode, default):
+        # per-state bookkeeping, indexed by state id
+        if typecode == 'b':
+            return bytearray([default]) * len(self)
+        return array(typecode, [default]) * len(self)
+
+    def column(self, typecode):
+        return array(typecode)
+
+    def mask(self, ids):
+        m = bytearray(len(self))
+        for i in ids:
+            m[i] = 1
+        return m
+
+    def estimates(self, state_est_cost, missing=math.nan):
+        # States without an estimate get missing: nan lets the heuristic
+        # checks skip them, searches use 0. Unknown states are ignored.
+        h = array('d', [missing]) * len(self)
+        for state, cost in state_est_cost.items():
+            if state in self:
+                h[self.id(state)] = cost
+        return h
+
+    @classmethod
+    def from_rows(cls, rows, extra=()):
+        # rows maps a state name to its raw 'child,cost child,cost' string
+        names = set(rows.keys()) | set(extra)
+        for r in rows.values():
+            names.update(c.split(',')[0] for c in r.split())
+        names = sorted(names)
+        index = {name: i for i, name in enumerate(names)}
+
+        offsets, targets, costs = array('q', [0]), array('q'), array('d')
+        for name in names:
+            edges = [c.split(',') for c in rows.get(name, '').split()]
+            edges = sorted(((index[c[0]], float(c[1])) for c in edges), key=lambda e: e[0])
+            for t, c in edges:
+                targets.append(t)
+                costs.append(c)
+            offsets.append(len(targets))
+        return cls(names, offsets, targets, costs)
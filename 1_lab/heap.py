@@ -0,0 +1,85 @@
+import heapq
+
+
+# Open lists hold tuple entries whose second field is the state id.
+
+class HeapQueue:
+    # plain binary heap; a cheaper entry is pushed next to the stale one
+    def __init__(self, space):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, entry):
+        heapq.heappush(self.heap, entry)
+
+    def peek(self):
+        return self.heap[0]
+
+    def pop(self):
+        return heapq.heappop(self.heap)
+
+
+class IndexedHeap:
+    # binary heap holding at most one entry per state; pushing an entry for
+    # a state already in the heap replaces it in place (decrease-key)
+    def __init__(self, space):
+        self.heap = []
+        self.pos = space.table('q', -1)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, state):
+        return self.pos[state] != -1
+
+    def push(self, entry):
+        i = self.pos[entry[1]]
+        if i == -1:
+            self.heap.append(entry)
+            self.__up(len(self.heap) - 1)
+        elif entry < self.heap[i]:
+            self.heap[i] = entry
+            self.__up(i)
+        else:
+            self.heap[i] = entry
+            self.__down(i)
+
+    def peek(self):
+        return self.heap[0]
+
+    def pop(self):
+        heap = self.heap
+        top, last = heap[0], heap.pop()
+        self.pos[top[1]] = -1
+        if heap:
+            heap[0] = last
+            self.__down(0)
+        return top
+
+    def __up(self, i):
+        heap, pos = self.heap, self.pos
+        entry = heap[i]
+        while i > 0:
+            p = (i - 1) >> 1
+            if not entry < heap[p]: break
+            heap[i] = heap[p]
+            pos[heap[i][1]] = i
+            i = p
+        heap[i] = entry
+        pos[entry[1]] = i
+
+    def __down(self, i):
+        heap, pos = self.heap, self.pos
+        entry, n = heap[i], len(heap)
+        while True:
+            c = 2 * i + 1
+            if c >= n: break
+            if c + 1 < n and heap[c + 1] < heap[c]: c += 1
+            if not heap[c] < entry: break
+            heap[i] = heap[c]
+            pos[heap[i][1]] = i
+            i = c
+        heap[i] = entry
+        pos[entry[1]] = i
@@ -0,0 +1,85 @@
+import argparse
+import math
+import solution
+from heap import HeapQueue, IndexedHeap
+from space import ImplicitSpace, Lookup
+
+
+parser = argparse.ArgumentParser(description='solve an n x n sliding tile puzzle, with 0 as the blank')
+parser.add_argument('tiles', metavar='tile', type=int, nargs='+',
+                    help='tiles row by row, e.g. 1 2 3 4 5 6 0 7 8')
+parser.add_argument('--alg', default='astar', choices=['bfs', 'ucs', 'astar', 'idastar'],
+                    help='state space search algorithm (values: bfs, ucs, astar, or idastar)')
+parser.add_argument('--open-list', default='heapq', choices=['heapq', 'indexed'],
+                    help='open list for ucs and astar (values: heapq, or indexed with decrease-key)')
+
+
+class SlidingPuzzle:
+    # states are tuples of tiles in row-major order
+    def __init__(self, size):
+        self.size = size
+        self.goal = tuple(range(1, size * size)) + (0,)
+        self.goal_pos = {tile: divmod(i, size) for i, tile in enumerate(self.goal)}
+
+    def successors(self, state):
+        i = state.index(0)
+        r, c = divmod(i, self.size)
+        for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            if 0 <= r + dr < self.size and 0 <= c + dc < self.size:
+                j = (r + dr) * self.size + c + dc
+                s = list(state)
+                s[i], s[j] = s[j], s[i]
+                yield tuple(s), 1.0
+
+    def is_goal(self, state):
+        return state == self.goal
+
+    def manhattan(self, state):
+        dist = 0
+        for i, tile in enumerate(state):
+            if tile:
+                r, c = self.goal_pos[tile]
+                dist += abs(i // self.size - r) + abs(i % self.size - c)
+        return float(dist)
+
+    def solvable(self, state):
+        tiles = [t for t in state if t]
+        inversions = sum(a > b for i, a in enumerate(tiles) for b in tiles[i + 1:])
+        if self.size % 2:
+            return inversions % 2 == 0
+        blank_row = self.size - state.index(0) // self.size
+        return (inversions + blank_row) % 2 == 1
+
+    def name(self, state):
+        return ''.join(map(str, state)) if self.size <= 3 else ','.join(map(str, state))
+
+
+def main():
+    args = parser.parse_args()
+    size = math.isqrt(len(args.tiles))
+    if size * size != len(args.tiles) or sorted(args.tiles) != list(range(size * size)):
+        print("Tiles must be a permutation of 0 .. n*n - 1.")
+        exit(1)
+
+    puzzle = SlidingPuzzle(size)
+    init_state = tuple(args.tiles)
+    space = ImplicitSpace(puzzle.successors, puzzle.name)
+    goal_states, h = Lookup(puzzle.is_goal), Lookup(puzzle.manhattan)
+    open_list = HeapQueue if args.open_list == 'heapq' else IndexedHeap
+
+    print(solution.HEADERS[args.alg])
+    if not puzzle.solvable(init_state):
+        solution.failed()
+    try:
+        goal, closed, path, peak = solution.search(args.alg, init_state, goal_states, space, h, open_list)
+    except solution.NotFound:
+        solution.failed()
+
+    print('[FOUND_SOLUTION]: ', end='')
+    solution.print_res(goal, closed, path, space)
+    if peak is not None:
+        print('[PEAK_FRONTIER]:', peak)
+
+
+if __name__ == '__main__':
+    main()
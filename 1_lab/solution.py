@@ -1,106 +1,426 @@
 import argparse
 import heapq
+import itertools
+import math
+import os
+from array import array
 from collections import deque
+import numpy as np
+import cache
+from graph import Graph
+from heap import HeapQueue, IndexedHeap
 
 
 parser = argparse.ArgumentParser()
-parser.add_argument('--alg', metavar='a', nargs=1, choices=['bfs', 'ucs', 'astar'],
-                    help='state space search algorithm (values: bfs, ucs, or astar)')
+parser.add_argument('--alg', metavar='a', nargs=1, choices=['bfs', 'ucs', 'astar', 'bidir', 'bidir-astar', 'idastar', 'smastar'],
+                    help='state space search algorithm (values: bfs, ucs, astar, bidir, bidir-astar, idastar, or smastar)')
 parser.add_argument('--ss', metavar='ssd_path', required=True, nargs=1,
                     help='path to state space descriptor file')
 parser.add_argument('--h', metavar='hd_path', nargs=1,
                     help='path to heuristic descriptor file')
+parser.add_argument('--budget', metavar='nodes', type=int,
+                    help='maximum number of nodes kept in memory by smastar')
+parser.add_argument('--cache', metavar='cache_dir', nargs=1,
+                    help='directory for compiled, memory-mapped copies of the descriptor files')
+parser.add_argument('--open-list', default='heapq', choices=['heapq', 'indexed'],
+                    help='open list for ucs and astar (values: heapq, or indexed with decrease-key)')
 parser.add_argument('--check-optimistic', action='store_true',
                     help='flag for checking if given heuristic is optimistic')
 parser.add_argument('--check-consistent', action='store_true',
                     help='flag for checking if given heuristic is consistent')
+parser.add_argument('--verbose', action='store_true',
+                    help='print a [CONDITION] line for every transition when checking consistency')
+parser.add_argument('--top-k', metavar='k', type=int,
+                    help='print only the k worst consistency violations, with their slack')
 
 
-def ucs(init_state, goal_states, transitions):
-    init_state = (0.0, init_state, None)
-
-    open_q = [init_state]
-    closed = set()
-    cheaper = dict()
-    cheaper.update({init_state[1]: init_state[0]})
+def ucs(init_state, goal_states, space, open_list=HeapQueue):
+    open_q = open_list(space)
+    open_q.push((0.0, init_state))
+    closed = space.table('b', 0)
+    visited = 0
+    cheaper = space.table('d', math.inf)
+    cheaper[init_state] = 0.0
+    parent = space.table('q', -1)
 
     while open_q:
-        n = heapq.heappop(open_q)
-        closed.add(n[1])
+        n = open_q.pop()
+        if closed[n[1]]: continue
+        closed[n[1]] = 1
+        visited += 1
+
+        if goal_states[n[1]]:
+            return n[0], visited, path_ids(parent, n[1])
+
+        for t, c in space.successors(n[1]):
+            s = (n[0] + c, t)
+            if closed[s[1]]: continue
+            if s[0] < cheaper[s[1]]:
+                cheaper[s[1]] = s[0]
+                parent[s[1]] = n[1]
+                open_q.push(s)
+    raise NotFound(visited)
+
+
+def ucs_tree(init_state, graph, open_list=HeapQueue):
+    # full shortest-path tree in ucs expansion order: a ucs query from
+    # init_state ends at the goal with the lowest order, after order + 1 states
+    open_q = open_list(graph)
+    open_q.push((0.0, init_state))
+    order = array('q', [-1]) * len(graph)
+    visited = 0
+    cheaper = array('d', [math.inf]) * len(graph)
+    cheaper[init_state] = 0.0
+    parent = array('q', [-1]) * len(graph)
+    offsets, targets, costs = graph.offsets, graph.targets, graph.costs
 
-        if n[1] in goal_states:
-            return n[0], len(closed), get_path(n)
+    while open_q:
+        n = open_q.pop()
+        if order[n[1]] != -1: continue
+        order[n[1]] = visited
+        visited += 1
 
-        successors = transitions.get(n[1])
-        for s in successors:
-            s = (n[0] + float(s[1]), s[0], n)
-            if s[1] in closed: continue
-            if s[1] not in cheaper.keys() or s[0] < cheaper.get(s[1]):
-                cheaper.update({s[1]: s[0]})
-                heapq.heappush(open_q, s)
-    failed()
+        for k in range(offsets[n[1]], offsets[n[1] + 1]):
+            s = (n[0] + costs[k], targets[k])
+            if order[s[1]] != -1: continue
+            if s[0] < cheaper[s[1]]:
+                cheaper[s[1]] = s[0]
+                parent[s[1]] = n[1]
+                open_q.push(s)
+    return cheaper, parent, order
 
 
-def bfs(init_state, goal_states, transitions):
-    init_state = (0.0, init_state, None)
-    if init_state[1] in goal_states:
-        return init_state[0], 1, get_path(init_state)
+def bfs(init_state, goal_states, space):
+    if goal_states[init_state]:
+        return 0.0, 1, [init_state]
 
     open_q = deque()
-    open_q.append(init_state)
-    closed = set()
+    open_q.append((0.0, init_state))
+    closed = space.table('b', 0)
+    visited = 0
+    parent = space.table('q', -1)
 
     while open_q:
         n = open_q.popleft()
-        successors = transitions.get(n[1])
-        for s in successors:
-            s = (n[0] + s[1], s[0], n) 
-            if s[1] in closed: continue
-            closed.add(s[1])
-            if s[1] in goal_states:
-                return s[0], len(closed), get_path(s)
+        for t, c in space.successors(n[1]):
+            s = (n[0] + c, t)
+            if closed[s[1]]: continue
+            closed[s[1]] = 1
+            visited += 1
+            if s[1] != init_state: parent[s[1]] = n[1]
+            if goal_states[s[1]]:
+                return s[0], visited, path_ids(parent, s[1])
             open_q.append(s)
-    failed()
+    raise NotFound(visited)
 
 
-def astar(init_state, goal_states, transitions, state_est_cost):
-    open_q = [(state_est_cost.get(init_state), init_state, None, 0.0)]
-    closed = set()
-    cheaper = dict()
-    cheaper.update({init_state: 0})
+def astar(init_state, goal_states, space, state_est_cost, open_list=HeapQueue):
+    # an inconsistent heuristic can expand a state more than once, so parents
+    # are kept per expansion: entries are (f, state, g, parent expansion)
+    open_q = open_list(space)
+    open_q.push((state_est_cost[init_state], init_state, 0.0, -1))
+    closed = space.table('b', 0)
+    visited = 0
+    cheaper = space.table('d', math.inf)
+    cheaper[init_state] = 0.0
+    expanded, parent = space.column('q'), array('q')
 
     while open_q:
-        n = heapq.heappop(open_q)
-        closed.add(n[1])
-
-        if n[1] in goal_states:
-            return n[3], len(closed), get_path(n)
-
-        successors = transitions.get(n[1])
-        for s in successors:
-            s = (n[3] + float(s[1]) + state_est_cost.get(s[0]), s[0], n, n[3] + float(s[1]))
-            if s[1] in closed: continue
-            if s[1] not in cheaper.keys() or s[3] < cheaper.get(s[1]):
-                cheaper.update({s[1]: s[3]})
-                heapq.heappush(open_q, (max(n[0], s[0]), s[1], n, s[3]))
-    failed()
-
+        n = open_q.pop()
+        if not closed[n[1]]:
+            closed[n[1]] = 1
+            visited += 1
+        expanded.append(n[1])
+        parent.append(n[3])
+
+        if goal_states[n[1]]:
+            path = path_ids(parent, len(parent) - 1)
+            return n[2], visited, [expanded[e] for e in path]
+
+        for t, c in space.successors(n[1]):
+            s = (n[2] + c + state_est_cost[t], t, n[2] + c)
+            if closed[s[1]]: continue
+            if s[2] < cheaper[s[1]]:
+                cheaper[s[1]] = s[2]
+                open_q.push((max(n[0], s[0]), s[1], s[2], len(parent) - 1))
+    raise NotFound(visited)
+
+
+def bidir(init_state, goal_states, graph, state_est_cost=None, open_list=HeapQueue):
+    # forward from the initial state and backward from all goals, both using
+    # the potential h/2 (-h/2 backward), which keeps reduced costs
+    # non-negative for a consistent heuristic; without one this is plain
+    # bidirectional dijkstra
+    if goal_states[init_state]:
+        return 0.0, 1, [init_state]
+
+    n = len(graph)
+    pot = array('d', [0.0]) * n
+    if state_est_cost is not None:
+        pot = array('d', (h / 2 for h in state_est_cost))
+    sides = []
+    for g, sign in ((graph, 1.0), (graph.reversed(), -1.0)):
+        sides.append((g, sign, array('d', [math.inf]) * n, array('q', [-1]) * n,
+                      bytearray(n), open_list(g)))
+
+    fwd, bwd = sides
+    fwd[2][init_state] = 0.0
+    fwd[5].push((pot[init_state], init_state))
+    for i in range(n):
+        if goal_states[i]:
+            bwd[2][i] = 0.0
+            bwd[5].push((-pot[i], i))
+
+    visited, best, meet = 0, math.inf, -1
+    while fwd[5] and bwd[5]:
+        if fwd[5].peek()[0] + bwd[5].peek()[0] >= best: break
+        forward = fwd[5].peek()[0] - pot[init_state] <= bwd[5].peek()[0]
+        side, other = (fwd, bwd) if forward else (bwd, fwd)
+        g, sign, dist, parent, closed, open_q = side
+
+        _, m = open_q.pop()
+        if closed[m]: continue
+        closed[m] = 1
+        visited += 1
+
+        for k in range(g.offsets[m], g.offsets[m + 1]):
+            t = g.targets[k]
+            d = dist[m] + g.costs[k]
+            if d < dist[t]:
+                dist[t] = d
+                parent[t] = m
+                open_q.push((d + sign * pot[t], t))
+            if dist[t] + other[2][t] < best:
+                best, meet = dist[t] + other[2][t], t
+
+    if meet == -1:
+        raise NotFound(visited)
+    path = path_ids(fwd[3], meet)
+    while bwd[3][path[-1]] != -1:
+        path.append(bwd[3][path[-1]])
+    return best, visited, path
+
+
+def idastar(init_state, goal_states, space, state_est_cost):
+    # depth-first contours with an explicit stack of (state, g, successors);
+    # states on the current path are skipped to break cycles
+    if goal_states[init_state]:
+        return 0.0, 1, [init_state], 1
+
+    on_path = space.table('b', 0)
+    bound = state_est_cost[init_state]
+    visited = peak = 0
+
+    while bound < math.inf:
+        stack = [(init_state, 0.0, iter(space.successors(init_state)))]
+        on_path[init_state] = 1
+        visited += 1
+        peak = max(peak, 1)
+        next_bound = math.inf
+
+        while stack:
+            m, g, successors = stack[-1]
+            t, c = next(successors, (None, None))
+            if c is None:
+                on_path[m] = 0
+                stack.pop()
+                continue
+
+            if on_path[t]: continue
+            f = g + c + state_est_cost[t]
+            if f > bound:
+                next_bound = min(next_bound, f)
+                continue
+            if goal_states[t]:
+                return g + c, visited, [e[0] for e in stack] + [t], peak
+            stack.append((t, g + c, iter(space.successors(t))))
+            on_path[t] = 1
+            visited += 1
+            peak = max(peak, len(stack))
+        bound = next_bound
+    raise NotFound(visited, peak)
+
+
+class SmaNode:
+    __slots__ = ('state', 'g', 'f', 'depth', 'parent', 'edge', 'k', 'children',
+                 'forgotten', 'dead', 'version')
+
+    def __init__(self, state, g, f, depth, parent, edge, k):
+        self.state = state
+        self.g = g
+        self.f = f
+        self.depth = depth
+        self.parent = parent
+        self.edge = edge
+        self.k = k
+        self.children = {}
+        self.forgotten = {}
+        self.dead = False
+        self.version = 0
+
+
+def smastar(init_state, goal_states, graph, state_est_cost, budget):
+    # at most budget nodes are kept; when memory is full the shallowest
+    # highest-f leaf is forgotten, its parent remembers the leaf's f and
+    # regenerates it once that f is the best one left
+    offsets, targets, costs = graph.offsets, graph.targets, graph.costs
+    best, worst, order = [], [], itertools.count()
+
+    def queue(node):
+        node.version += 1
+        heapq.heappush(best, (node.f, -node.depth, next(order), node.version, node))
+        heapq.heappush(worst, (-node.f, node.depth, next(order), node.version, node))
+
+    def on_path(node, state):
+        while node is not None:
+            if node.state == state: return True
+            node = node.parent
+        return False
+
+    def skip(node):
+        end = offsets[node.state + 1]
+        while node.k < end and on_path(node, targets[node.k]):
+            node.k += 1
+
+    def backup(node):
+        while node is not None and node.k == offsets[node.state + 1]:
+            f = min(min((c.f for c in node.children.values()), default=math.inf),
+                    min(node.forgotten.values(), default=math.inf))
+            if f == node.f: break
+            node.f = f
+            queue(node)
+            node = node.parent
+
+    root = SmaNode(init_state, 0.0, state_est_cost[init_state], 0, None, -1, offsets[init_state])
+    skip(root)
+    queue(root)
+    used = peak = 1
+    visited = 0
+
+    while best:
+        _, _, _, version, n = heapq.heappop(best)
+        if n.version != version or n.dead: continue
+        if n.f == math.inf: break
+        visited += 1
+
+        if goal_states[n.state]:
+            path, cost = [], n.g
+            while n is not None:
+                path.append(n.state)
+                n = n.parent
+            path.reverse()
+            return cost, visited, path, peak
+
+        if n.k < offsets[n.state + 1]:
+            k = n.k
+            n.k += 1
+            skip(n)
+            f = max(n.f, n.g + costs[k] + state_est_cost[targets[k]])
+        elif n.forgotten:
+            k = min(n.forgotten, key=n.forgotten.get)
+            f = max(n.f, n.forgotten.pop(k))
+        else:
+            continue
+        s = SmaNode(targets[k], n.g + costs[k], f, n.depth + 1, n, k, offsets[targets[k]])
+        skip(s)
+        if not goal_states[s.state] and (s.depth >= budget - 1 or s.k == offsets[s.state + 1]):
+            s.f = math.inf
+        n.children[k] = s
+        used += 1
+        if n.k < offsets[n.state + 1] or n.forgotten:
+            queue(n)
+        backup(n)
+
+        while used > budget:
+            _, _, _, version, leaf = heapq.heappop(worst)
+            if leaf.version != version or leaf.dead or leaf.children or leaf is root: continue
+            leaf.dead = True
+            used -= 1
+            p = leaf.parent
+            del p.children[leaf.edge]
+            p.forgotten[leaf.edge] = leaf.f
+            backup(p)
+            queue(p)
+        queue(s)
+        peak = max(peak, used)
+    raise NotFound(visited, peak)
+
+
+def true_costs(goal_states, graph):
+    # one multi-source dijkstra from all goals over the reversed edges
+    rev = graph.reversed()
+    dist = array('d', [math.inf]) * len(graph)
+    closed = bytearray(len(graph))
+    open_q = []
+    for i in range(len(graph)):
+        if goal_states[i]:
+            dist[i] = 0.0
+            open_q.append((0.0, i))
+    offsets, targets, costs = rev.offsets, rev.targets, rev.costs
 
-def check_optimistic(goal_states, transitions, state_est_cost):
+    while open_q:
+        d, n = heapq.heappop(open_q)
+        if closed[n]: continue
+        closed[n] = 1
+        for k in range(offsets[n], offsets[n + 1]):
+            c = d + costs[k]
+            if c < dist[targets[k]]:
+                dist[targets[k]] = c
+                heapq.heappush(open_q, (c, targets[k]))
+    return dist
+
+
+def check_optimistic(goal_states, graph, state_est_cost):
     res = ['OK', '']
-    for st in state_est_cost.items():
-        real_cost = ucs(st[0], goal_states, transitions)[0]
+    h_star = true_costs(goal_states, graph)
+    for i in range(len(graph)):
+        if math.isnan(state_est_cost[i]): continue
+        st = (graph.name(i), state_est_cost[i])
+        real_cost = h_star[i]
         if st[1] <= real_cost: res[0] = 'OK'
         else: res = ['ERR', 'not ']
         print(f'[CONDITION]: [{res[0]}] h({st[0]}) <= h*: {st[1]} <= {real_cost}')
     print(f'[CONCLUSION]: Heuristic is {res[1]}optimistic.')
 
 
-def check_consistent(transitions, state_est_cost):
+def check_consistent(graph, state_est_cost, verbose=False, top_k=None):
+    if verbose:
+        return check_consistent_verbose(graph, state_est_cost)
+
+    # h(s) <= h(t) + c over all edges at once; only violations are printed
+    h = np.frombuffer(state_est_cost, dtype=np.float64)
+    offsets = np.frombuffer(graph.offsets, dtype=np.int64)
+    targets = np.frombuffer(graph.targets, dtype=np.int64)
+    costs = np.frombuffer(graph.costs, dtype=np.float64)
+    sources = np.repeat(np.arange(len(graph)), np.diff(offsets))
+
+    h_s, h_t = h[sources], h[targets]
+    checked = ~np.isnan(h_s)
+    slack = h_t + costs - h_s
+    # an edge into a state without an estimate cannot hold, as in verbose mode
+    bad = np.flatnonzero(checked & ~(h_s <= h_t + costs))
+    violations = len(bad)
+    if top_k is not None:
+        bad = bad[np.argsort(slack[bad], kind='stable')[:top_k]]
+
+    for e in bad:
+        s, t = graph.name(sources[e]), graph.name(targets[e])
+        line = f'[CONDITION]: [ERR] h({s}) <= h({t}) + c: {float(h_s[e])} <= {float(h_t[e])} + {float(costs[e])}'
+        if top_k is not None:
+            line += f' [SLACK]: {float(slack[e])}'
+        print(line)
+    print(f'[VIOLATIONS]: {violations} of {int(np.count_nonzero(checked))} transitions')
+    print(f'[CONCLUSION]: Heuristic is {"not " if violations else ""}consistent.')
+
+
+def check_consistent_verbose(graph, state_est_cost):
     res = ['OK', '']
-    for st in state_est_cost.items():
-        for child in transitions.get(st[0]):
-            child_h = state_est_cost.get(child[0])
+    for i in range(len(graph)):
+        if math.isnan(state_est_cost[i]): continue
+        st = (graph.name(i), state_est_cost[i])
+        for child in graph.successors(i):
+            child_h = state_est_cost[child[0]]
+            child = (graph.name(child[0]), child[1])
             if st[1] <= child_h + child[1]: res[0] = 'OK'
             else: res = ['ERR', 'not ']
             print(f'[CONDITION]: [{res[0]}] h({st[0]}) <= h({child[0]}) + c: {st[1]} <= {child_h} + {child[1]}')
@@ -109,13 +429,13 @@ def check_consistent(transitions, state_est_cost):
 
 def parse_ss_file(file):
     data = [line.rstrip('\n') for line in file.readlines() if not line.startswith('#')]
-    transitions = {}
+    init_state, goal_states = data[0].strip(), data[1].strip().split()
+    rows = {}
     for t in data[2:]:
         t = t.split(':')
-        children = [(i.split(',')[0], float(i.split(',')[1])) for i in t[1].strip().split()]
-        children.sort(key=lambda x: x[0])
-        transitions.update({t[0]: children})
-    return data[0].strip(), set(data[1].strip().split()), transitions
+        rows.update({t[0]: t[1]})
+    graph = Graph.from_rows(rows, [init_state] + goal_states)
+    return graph.id(init_state), graph.mask(map(graph.id, goal_states)), graph
 
 
 def parse_hd_file(file):
@@ -127,73 +447,136 @@ def parse_hd_file(file):
     return dict(sorted(state_est_cost.items()))
 
 
-def get_path(node):
-    return get_path_rec('', node)
+def path_ids(parent, state):
+    path = [state]
+    while parent[path[-1]] != -1:
+        path.append(parent[path[-1]])
+    path.reverse()
+    return path
+
+
+def get_path(path, graph):
+    return ' => '.join(graph.name(s) for s in path)
 
 
-def get_path_rec(path, node):
-    if node[2] is not None:
-        path += get_path_rec(path, node[2]) + ' => '
-    return path + node[1]
+class NotFound(Exception):
+    # carries the counters of the failed search: states visited and, for
+    # idastar and smastar, the peak frontier
+    def __init__(self, visited=None, peak=None):
+        super().__init__(visited, peak)
+        self.visited = visited
+        self.peak = peak
+
 
 def failed():
     print('[FOUND_SOLUTION]: no')
     exit(1)
 
-def print_res(cost, closed, path):
+def print_res(cost, closed, path, graph):
     print('yes'),
     print('[STATES_VISITED]:', closed)
-    print('[PATH_LENGTH]:', len(path.split('=>')))
+    print('[PATH_LENGTH]:', len(path))
     print('[TOTAL_COST]:', cost)
-    print('[PATH]:', path)
+    print('[PATH]:', get_path(path, graph))
+
+
+HEADERS = {'bfs': '# BFS', 'ucs': '# UCS', 'bidir': '# BIDIRECTIONAL-UCS', 'astar': '# A-STAR',
+           'bidir-astar': '# BIDIRECTIONAL-A-STAR', 'idastar': '# IDA-STAR', 'smastar': '# SMA-STAR'}
+HEURISTIC_ALGS = ('astar', 'bidir-astar', 'idastar', 'smastar')
+
+
+def search(alg, init_state, goal_states, graph, state_est_cost=None, open_list=HeapQueue, budget=None):
+    # returns cost, visited states, path ids and peak frontier (or None)
+    if alg == 'bfs':
+        return bfs(init_state, goal_states, graph) + (None,)
+    if alg == 'ucs':
+        return ucs(init_state, goal_states, graph, open_list) + (None,)
+    if alg == 'bidir':
+        return bidir(init_state, goal_states, graph, None, open_list) + (None,)
+    if alg == 'astar':
+        return astar(init_state, goal_states, graph, state_est_cost, open_list) + (None,)
+    if alg == 'bidir-astar':
+        return bidir(init_state, goal_states, graph, state_est_cost, open_list) + (None,)
+    if alg == 'idastar':
+        return idastar(init_state, goal_states, graph, state_est_cost)
+    if budget is None or budget < 2:
+        # the root and the child being added must both fit
+        raise ValueError('smastar needs a node budget of at least 2')
+    return smastar(init_state, goal_states, graph, state_est_cost, budget)
+
+
+def load_ss(ssd_path, cache_dir=None):
+    # returns the cache key (None without a cache), initial state, goals and graph
+    if cache_dir is None:
+        with open(ssd_path, 'r', encoding='utf8') as file:
+            return (None,) + parse_ss_file(file)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache.load_ss(ssd_path, cache_dir, parse_ss_file)
+
+
+def load_hd(hd_path, graph, graph_key=None, cache_dir=None, search=False):
+    # search: states without an estimate are 0 rather than nan
+    if cache_dir is None:
+        with open(hd_path, 'r', encoding='utf-8') as hd_file:
+            return graph.estimates(parse_hd_file(hd_file), 0.0 if search else math.nan)
+    return cache.load_hd(hd_path, graph_key, graph, cache_dir, parse_hd_file, search)
 
 
 def main():
     args = parser.parse_args()
     ssd_path = args.ss[0]
+    cache_dir = args.cache[0] if args.cache is not None else None
 
     try:
-        with open(ssd_path, 'r', encoding='utf8') as file:
-            init_state, goal_states, transitions = parse_ss_file(file)
+        graph_key, init_state, goal_states, graph = load_ss(ssd_path, cache_dir)
     except OSError:
         print("State space descriptor file path does not exist.")
         exit(1)
 
+    open_list = HeapQueue if args.open_list == 'heapq' else IndexedHeap
+    state_est_cost = None
     alg = ''
     if args.alg is not None:
         alg = args.alg[0]
-    if alg == 'bfs':
-        print('# BFS')
-        goal, closed, path = bfs(init_state, goal_states, transitions)
-    elif alg == 'ucs':
-        print('# UCS')
-        goal, closed, path = ucs(init_state, goal_states, transitions)
-    elif alg == 'astar' or args.check_optimistic or args.check_consistent:
+    if alg in HEURISTIC_ALGS or (alg == '' and (args.check_optimistic or args.check_consistent)):
         if args.h is None:
             print("Path to heuristic description file not provided.")
             parser.print_usage()
             exit(1)
         try:
             hd_file_path = args.h[0]
-            with open(hd_file_path, 'r', encoding='utf-8') as hd_file:
-                state_est_cost = parse_hd_file(hd_file)
+            state_est_cost = load_hd(hd_file_path, graph, graph_key, cache_dir, search=alg != '')
         except OSError:
             print("Heuristic description file path does not exist.")
             exit(1)
+        if alg == 'smastar' and (args.budget is None or args.budget < 2):
+            print("Node budget for SMA-STAR not provided or below 2.")
+            parser.print_usage()
+            exit(1)
 
-        if alg == 'astar':
-            print('# A-STAR', hd_file_path)
-            goal, closed, path = astar(init_state, goal_states, transitions, state_est_cost)
-        elif args.check_optimistic:
+    if alg == '':
+        if args.check_optimistic:
             print('# HEURISTIC-OPTIMISTIC', hd_file_path)
-            check_optimistic(goal_states, transitions, state_est_cost)
-        else:
+            check_optimistic(goal_states, graph, state_est_cost)
+        elif args.check_consistent:
             print('# HEURISTIC-CONSISTENT', hd_file_path)
-            check_consistent(transitions, state_est_cost)
+            check_consistent(graph, state_est_cost, args.verbose, args.top_k)
+        return
 
-    if alg != '':
-        print('[FOUND_SOLUTION]: ', end='')
-        print_res(goal, closed, path)
+    if alg in HEURISTIC_ALGS:
+        print(HEADERS[alg], hd_file_path)
+    else:
+        print(HEADERS[alg])
+    try:
+        goal, closed, path, peak = search(alg, init_state, goal_states, graph, state_est_cost,
+                                          open_list, args.budget)
+    except NotFound:
+        failed()
+
+    print('[FOUND_SOLUTION]: ', end='')
+    print_res(goal, closed, path, graph)
+    if peak is not None:
+        print('[PEAK_FRONTIER]:', peak)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,34 @@
+class Table(dict):
+    # sparse per-state bookkeeping for spaces without dense state ids
+    def __init__(self, default):
+        super().__init__()
+        self.default = default
+
+    def __missing__(self, state):
+        return self.default
+
+
+class Lookup:
+    # adapts a function of a state to the goal_states[s] / state_est_cost[s]
+    # indexing the search algorithms use
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __getitem__(self, state):
+        return self.fn(state)
+
+
+class ImplicitSpace:
+    # State space generated on demand: successors(state) returns or yields
+    # (state, cost) pairs. States only need to be hashable and ordered, so
+    # compact tuples or ints work best. Graph offers the same interface for
+    # descriptor files.
+    def __init__(self, successors, name=str):
+        self.successors = successors
+        self.name = name
+
+    def table(self, typecode, default):
+        return Table(default)
+
+    def column(self, typecode):
+        return []
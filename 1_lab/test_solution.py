@@ -0,0 +1,53 @@
+import random
+from array import array
+import pytest
+import solution
+from graph import Graph
+
+
+def random_graph(seed, n=12):
+    rng = random.Random(seed)
+    rows = {}
+    for i in range(n):
+        children = rng.sample(range(n), rng.randint(1, 3))
+        rows[f's{i:02}'] = ' '.join(f's{c:02},{rng.randint(1, 9)}' for c in children)
+    graph = Graph.from_rows(rows)
+    return graph.id('s00'), graph.mask([graph.id(f's{n - 1:02}')]), graph
+
+
+def test_smastar_smallest_budget():
+    for seed in range(30):
+        init_state, goal_states, graph = random_graph(seed)
+        h = array('d', [0.0]) * len(graph)
+        try:
+            cost, visited, path, peak = solution.search('smastar', init_state, goal_states, graph, h, budget=2)
+        except solution.NotFound:
+            continue
+        assert peak <= 2
+        assert path[0] == init_state and goal_states[path[-1]]
+
+
+def test_smastar_rejects_budget_below_two():
+    init_state, goal_states, graph = random_graph(0)
+    h = array('d', [0.0]) * len(graph)
+    for budget in (None, 0, 1):
+        with pytest.raises(ValueError):
+            solution.search('smastar', init_state, goal_states, graph, h, budget=budget)
+
+
+def test_consistency_modes_agree_on_partial_heuristic(tmp_path, capsys):
+    ss, hd = tmp_path / 'ss.txt', tmp_path / 'h.txt'
+    ss.write_text('a\nd\na: b,1 c,2\nb: c,1 d,4\nc: d,1\nd: a,3\n')
+    hd.write_text('a: 2\nc: 1\nd: 0\n')
+    graph = solution.load_ss(str(ss))[3]
+    h = solution.load_hd(str(hd), graph)
+
+    def errors(verbose):
+        solution.check_consistent(graph, h, verbose)
+        lines = capsys.readouterr().out.splitlines()
+        return [l for l in lines if '[ERR]' in l], lines[-1]
+
+    quick, verbose = errors(False), errors(True)
+    assert quick == verbose
+    assert len(quick[0]) == 1 and 'h(b)' in quick[0][0]
+    assert quick[1] == '[CONCLUSION]: Heuristic is not consistent.'
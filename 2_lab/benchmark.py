@@ -0,0 +1,132 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+import solution
+from sat import satisfiable
+
+
+parser = argparse.ArgumentParser(description="benchmark the provers on seeded random k-CNF knowledge bases")
+parser.add_argument("--k", type=int, default=3,
+                    help="literals per clause")
+parser.add_argument("--vars", metavar="n", type=int, nargs="+", default=[20, 30, 40],
+                    help="number of atoms per generated knowledge base")
+parser.add_argument("--ratio", type=float,
+                    help="clauses per atom (default: the satisfiability threshold for k)")
+parser.add_argument("--instances", type=int, default=3,
+                    help="knowledge bases generated per size")
+parser.add_argument("--engine", nargs="+", default=["resolution"], choices=["resolution", "sat"],
+                    help="provers to benchmark")
+parser.add_argument("--pick-ratio", type=int, nargs="+", default=[5],
+                    help="pick ratios to run resolution with")
+parser.add_argument("--max-seconds", type=float, default=10.0,
+                    help="time limit per resolution run")
+parser.add_argument("--max-clauses", type=int,
+                    help="generated clause limit per resolution run")
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--workdir", metavar="dir",
+                    help="where generated clause files are written (default: a temporary directory)")
+parser.add_argument("--out", metavar="results_path", default="benchmark.json",
+                    help="JSON file the results are written to")
+
+
+def threshold(k):
+    # 4.26 for 3-CNF; the first-moment estimate 2^k ln 2 above that
+    return 4.26 if k == 3 else 2 ** k * math.log(2)
+
+
+def kcnf(n, m, k, rng):
+    # m clauses of k distinct atoms with random signs, redrawn until the
+    # knowledge base is satisfiable; the goal is a random literal
+    while True:
+        clauses = [[a if rng.random() < 0.5 else -a for a in rng.sample(range(1, n + 1), k)]
+                   for _ in range(m)]
+        if satisfiable(clauses):
+            return clauses, rng.choice([1, -1]) * rng.randint(1, n)
+
+
+def write_clauses(path, clauses, goal):
+    def text(l):
+        return f"~x{-l}" if l < 0 else f"x{l}"
+    with open(path, "w", encoding="utf8") as file:
+        for c in clauses:
+            file.write(" v ".join(map(text, c)) + "\n")
+        file.write(text(goal) + "\n")
+
+
+def prove(engine, goal, initial, pick_ratio, limits, stats=None, profile=None):
+    if engine == "sat":
+        return solution.sat(goal, initial)[0]
+    return solution.resolution(goal, initial, pick_ratio=pick_ratio, limits=limits,
+                               stats=stats, profile=profile)[0]
+
+
+def run(path, engine, pick_ratio, limits):
+    # Runs in a fresh process. Peak RSS also counts the interpreter and the
+    # parsed clauses, so the proof is run a second time under tracemalloc
+    # for the peak memory it allocates itself; the timed run is not traced.
+    data, goal, initial = solution.parse_res_file(path)
+    stats, profile = Counter(), Counter()
+    res = {"clauses": len(data) - 1}
+    start = time.perf_counter()
+    try:
+        res.update(found=prove(engine, goal, initial, pick_ratio, limits, stats, profile))
+    except solution.SearchLimit as e:
+        res.update(found=None, limit=e.args[0])
+    res["wall_time"] = time.perf_counter() - start
+    res["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    try:
+        prove(engine, goal, initial, pick_ratio, limits)
+    except solution.SearchLimit:
+        pass
+    res["proof_alloc_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+    tracemalloc.stop()
+    if engine == "resolution":
+        res.update({k: stats[k] for k in solution.STATS})
+        res.update({f"{s}_time": profile[s] for s in solution.STAGES})
+    return res
+
+
+def main():
+    args = parser.parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="kcnf-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    ratio = args.ratio or threshold(args.k)
+    limits = {"seconds": args.max_seconds, "clauses": args.max_clauses}
+    ctx = multiprocessing.get_context("spawn")
+
+    results = []
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for n in args.vars:
+            for i in range(args.instances):
+                rng = random.Random(f"{args.seed}-{args.k}-{n}-{ratio}-{i}")
+                path = os.path.join(workdir, f"k{args.k}_n{n}_r{ratio:g}_{args.seed}_{i}.txt")
+                write_clauses(path, *kcnf(n, round(ratio * n), args.k, rng))
+
+                for engine in args.engine:
+                    for pick_ratio in args.pick_ratio if engine == "resolution" else [None]:
+                        res = pool.apply(run, (path, engine, pick_ratio, limits))
+                        res.update(k=args.k, vars=n, ratio=ratio, seed=args.seed, instance=i,
+                                   engine=engine, pick_ratio=pick_ratio)
+                        results.append(res)
+                        found = {True: "true", False: "unknown", None: "limit:" + res.get("limit", "")}
+                        print(f"{n:>5} {i:>3} {engine:>10} {str(pick_ratio):>4} "
+                              f"{res['wall_time']:9.3f}s {res['proof_alloc_kb']:>8}KB {found[res['found']]:>14} "
+                              f"generated={res.get('generated')} pairs={res.get('pairs')} "
+                              f"redundancy={res.get('redundancy_time', 0):.3f}s")
+
+    with open(args.out, "w", encoding="utf8") as file:
+        json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
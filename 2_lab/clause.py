@@ -1,18 +1,36 @@
-from literal import Literal
+import literal
+
+
+class Clause:
+    # literals are a frozenset of interned ints; the hash is computed once
+    # since clauses are immutable and live in many sets at once
+    __slots__ = ('literals', 'parents', 'hash')
 
-class Clause: 
     def __init__(self, literals, parents):
-        self.literals = set(literals)
+        self.literals = frozenset(literals)
         self.parents = parents
+        self.hash = hash(self.literals)
+
+    @classmethod
+    def parse(cls, line):
+        return cls([
+            literal.literal(l.replace("~", ""), l.startswith("~"))
+            for l in line.lower().split()
+            if l != "v"
+        ], None)
+
+    @classmethod
+    def named(cls, keys, parents):
+        return cls([literal.literal(name, neg) for name, neg in keys], parents)
 
     def __str__(self):
-        return ' v '.join([str(literal) for literal in sorted(self.literals)])
+        return ' v '.join([literal.to_str(l) for l in sorted(self.literals, key=literal.key)])
 
     def __repr__(self):
         return self.__str__()
 
     def __eq__(self, other):
-        return self.__key() == other.__key()
+        return self.hash == other.hash and self.literals == other.literals
 
     def __lt__(self, other):
         return len(self.literals) < len(other.literals) or \
@@ -23,28 +41,132 @@ class Clause:
         (len(self.literals) == len(other.literals) and self.__key() > other.__key())
 
     def __hash__(self):
-        return hash(self.__key())
+        return self.hash
 
-    def isRedundant(self, other):
-        for c in other:
-            if self != c and c.literals.issubset(self.literals): return True
+    def isResolvable(self, other):
+        for l in self.literals:
+            if -l in other.literals: return True
         return False
 
-    def isResolvable(self, other):
-        for literal in self.literals: 
-            if literal.negate() in other.literals: return True 
-        return False 
+    def isTautology(self):
+        return self.isResolvable(self)
 
     def negate(self):
-        negations = set()
-        [negations.add(Clause([l.negate()], None)) for l in self.literals]
-        return negations
+        return {Clause([-l], None) for l in self.literals}
 
     def __key(self):
-        return tuple(sorted(self.literals))
+        # name order, only needed when printing
+        return sorted(map(literal.key, self.literals))
 
     def get_literals(self):
         return self.literals
 
     def get_parents(self):
-        return self.parents
\ No newline at end of file
+        return self.parents
+
+
+def derivation(proof):
+    # the clauses of a proof DAG, each once and after its parents
+    order, done, stack = [], set(), [proof]
+    while stack:
+        c = stack[-1]
+        if id(c) in done:
+            stack.pop()
+            continue
+        pending = [p for p in c.parents or () if id(p) not in done]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        done.add(id(c))
+        order.append(c)
+    return order
+
+
+def pack(proof):
+    # The proof as a flat list of (literal names, parent positions).
+    # Interned ints are private to a process, so clauses travel by name, and
+    # a flat list pickles without recursing down long derivations.
+    order = derivation(proof)
+    index = {id(c): i for i, c in enumerate(order)}
+    return [([literal.key(l) for l in c.literals], c.parents and tuple(index[id(p)] for p in c.parents))
+            for c in order]
+
+
+def unpack(nodes):
+    clauses = []
+    for keys, parents in nodes:
+        clauses.append(Clause.named(keys, parents and tuple(clauses[i] for i in parents)))
+    return clauses[-1]
+
+
+class ClauseSet:
+    # clauses indexed by every literal they hold, and once more by their
+    # smallest literal so a search for subsets of a clause meets each
+    # candidate once; the empty clause is filed under the reserved atom 0.
+    # A set layered over a base reads through to it but never modifies it:
+    # base clauses removed from the layer are only hidden.
+    def __init__(self, base=None):
+        self.occurs = {}
+        self.first = {}
+        self.base = base
+        self.hidden = set()
+
+    def __len__(self):
+        own = sum(map(len, self.first.values()))
+        return own if self.base is None else own + len(self.base) - len(self.hidden)
+
+    def __iter__(self):
+        if self.base is not None:
+            yield from (c for c in self.base if c not in self.hidden)
+        for cs in self.first.values():
+            yield from cs
+
+    def __contains__(self, clause):
+        if clause in self.first.get(min(clause.literals, default=0), ()):
+            return True
+        return self.base is not None and clause not in self.hidden and clause in self.base
+
+    def add(self, clause):
+        if self.base is not None and clause in self.base:
+            self.hidden.discard(clause)
+            return
+        for l in clause.literals:
+            self.occurs.setdefault(l, {})[clause] = None
+        self.first.setdefault(min(clause.literals, default=0), {})[clause] = None
+
+    def remove(self, clause):
+        first = self.first.get(min(clause.literals, default=0), {})
+        if clause not in first:
+            self.hidden.add(clause)
+            return
+        for l in clause.literals:
+            del self.occurs[l][clause]
+        del first[clause]
+
+    def filed(self, table, l):
+        # clauses filed under l in the occurs or first table, base ones first
+        if self.base is not None:
+            yield from (c for c in self.base.filed(table, l) if c not in self.hidden)
+        yield from getattr(self, table).get(l, ())
+
+    def count(self, l):
+        own = len(self.occurs.get(l, ()))
+        return own if self.base is None else own + self.base.count(l)
+
+    def containing(self, l):
+        return list(self.filed('occurs', l))
+
+    def subsumes(self, clause):
+        # forward: some clause in the set is a subset of clause
+        for l in (0, *clause.literals):
+            for c in self.filed('first', l):
+                if c.literals <= clause.literals: return True
+        return False
+
+    def subsumed_by(self, clause):
+        # backward: clauses in the set that are proper supersets of clause
+        if not clause.literals:
+            return [c for c in self if c.literals]
+        rarest = min(clause.literals, key=self.count)
+        return [c for c in self.filed('occurs', rarest) if clause.literals < c.literals]
@@ -0,0 +1,84 @@
+import itertools
+import os
+from collections import Counter, deque
+from clause import Clause
+
+
+class KnowledgeBase:
+    # The clause file is read once and edited in memory. Lines are kept by
+    # sequence number with an index from their lowercased text to the
+    # sequence numbers holding it, so removing the first matching line does
+    # not scan the file; clauses are counted since several lines may parse
+    # to the same clause. Edits reach the file in batches of flush_every.
+    # Every edit that changes the clause set bumps version and is reported
+    # to the listeners as (clause, added). Unlike the old per-command writes,
+    # a flush keeps the case of the lines it did not remove and ends every
+    # line with a newline, so an added line never joins a last line that
+    # had none.
+    def __init__(self, path, flush_every=100):
+        self.path = path
+        self.flush_every = flush_every
+        self.lines = {}
+        self.seq = itertools.count()
+        self.where = {}
+        self.counts = Counter()
+        self.pending = 0
+        self.version = 0
+        self.listeners = []
+        with open(path, "r", encoding="utf8") as file:
+            for line in file:
+                self.insert(line.rstrip("\n"))
+
+    def data(self):
+        return [line for line in self.lines.values() if not line.startswith("#")]
+
+    def clauses(self):
+        return set(self.counts)
+
+    def insert(self, line):
+        seq = next(self.seq)
+        self.lines[seq] = line
+        self.where.setdefault(line.lower(), deque()).append(seq)
+        if not line.startswith("#"):
+            clause = Clause.parse(line)
+            self.counts[clause] += 1
+            return clause if self.counts[clause] == 1 else None
+
+    def add(self, line):
+        clause = self.insert(line)
+        if clause is not None:
+            self.changed(clause, True)
+        self.edited()
+
+    def remove(self, line):
+        seqs = self.where.get(line)
+        if not seqs:
+            return False
+        text = self.lines.pop(seqs.popleft())
+        if not text.startswith("#"):
+            clause = Clause.parse(text)
+            self.counts[clause] -= 1
+            if not self.counts[clause]:
+                del self.counts[clause]
+                self.changed(clause, False)
+        self.edited()
+        return True
+
+    def changed(self, clause, added):
+        self.version += 1
+        for listener in self.listeners:
+            listener(clause, added)
+
+    def edited(self):
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf8") as file:
+            file.writelines(line + "\n" for line in self.lines.values())
+        os.replace(tmp, self.path)
+        self.pending = 0
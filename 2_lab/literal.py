@@ -1,31 +1,27 @@
+# Literals are interned to signed ints: the i-th atom seen is i and its
+# negation is -i, so negating a literal is flipping its sign. Atom 0 is
+# reserved so that every literal has a sign.
+names = [None]
+atoms = {}
 
-class Literal:
-    def __init__(self, name, neg):        
-        self.name = name
-        self.neg = neg
 
-    def __str__(self):
-        if self.neg: return '~' + self.name
-        return self.name
+def literal(name, neg):
+    atom = atoms.get(name)
+    if atom is None:
+        atom = atoms[name] = len(names)
+        names.append(name)
+    return -atom if neg else atom
 
-    def __eq__(self, other):
-        return self.__key() == other.__key()
 
-    def __lt__(self, other):
-        return self.__key() < other.__key()
+def name(lit):
+    return names[abs(lit)]
 
-    def __gt__(self, other):
-        return self.__key() > other.__key()
 
-    def __repr__(self):
-        return self.__str__()
+def key(lit):
+    # literals sort by name, then positive before negated
+    return (names[abs(lit)], lit < 0)
 
-    def __key(self):
-        return (self.name, self.neg)
 
-    def __hash__(self):
-        return hash(self.__key())
-
-    def negate(self):
-        return Literal(self.name, not self.neg)
-    
+def to_str(lit):
+    if lit < 0: return '~' + names[-lit]
+    return names[lit]
@@ -0,0 +1,190 @@
+import heapq
+
+
+class Solver:
+    # CDCL over clauses of interned literals (atom i, negation -i): two
+    # watched literals per clause, first-UIP clause learning with
+    # non-chronological backjumping and activity-ordered decisions with
+    # saved phases. assign holds 1/-1/0 per atom; a clause that implied a
+    # literal keeps it in position 0. solve takes assumptions that are
+    # decided first, so one solver answers many queries over the same
+    # clauses and keeps what it learnt in between.
+    def __init__(self, clauses):
+        clauses = [list(c) for c in clauses]
+        self.assign = [0]
+        self.level = [0]
+        self.reason = [None]
+        self.phase = [-1]
+        self.activity = [0.0]
+        self.inc = 1.0
+        self.order = []
+        self.grow(max((abs(l) for c in clauses for l in c), default=0))
+        self.clauses = []
+        self.watches = {}
+        self.trail = []
+        self.limits = []
+        self.head = 0
+        self.ok = True
+
+        for c in clauses:
+            if any(-l in c for l in c):
+                continue
+            c = list(dict.fromkeys(c))
+            if not c:
+                self.ok = False
+            elif len(c) == 1:
+                if not self.enqueue(c[0], None):
+                    self.ok = False
+            else:
+                self.attach(c)
+
+    def grow(self, n):
+        for v in range(len(self.assign), n + 1):
+            self.assign.append(0)
+            self.level.append(0)
+            self.reason.append(None)
+            self.phase.append(-1)
+            self.activity.append(0.0)
+            heapq.heappush(self.order, (0.0, v))
+
+    def value(self, l):
+        return self.assign[l] if l > 0 else -self.assign[-l]
+
+    def attach(self, c):
+        self.clauses.append(c)
+        self.watches.setdefault(c[0], []).append(len(self.clauses) - 1)
+        self.watches.setdefault(c[1], []).append(len(self.clauses) - 1)
+        return len(self.clauses) - 1
+
+    def enqueue(self, l, reason):
+        v = self.value(l)
+        if v:
+            return v == 1
+        self.assign[abs(l)] = 1 if l > 0 else -1
+        self.level[abs(l)] = len(self.limits)
+        self.reason[abs(l)] = reason
+        self.trail.append(l)
+        return True
+
+    def propagate(self):
+        # returns the index of a falsified clause, or None
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            watching = self.watches.get(false, [])
+            kept = []
+            for j, ci in enumerate(watching):
+                c = self.clauses[ci]
+                if c[0] == false:
+                    c[0], c[1] = c[1], c[0]
+                if self.value(c[0]) == 1:
+                    kept.append(ci)
+                    continue
+                for k in range(2, len(c)):
+                    if self.value(c[k]) != -1:
+                        c[1], c[k] = c[k], c[1]
+                        self.watches.setdefault(c[1], []).append(ci)
+                        break
+                else:
+                    kept.append(ci)
+                    if not self.enqueue(c[0], ci):
+                        kept.extend(watching[j + 1:])
+                        self.watches[false] = kept
+                        return ci
+            self.watches[false] = kept
+        return None
+
+    def bump(self, v):
+        self.activity[v] += self.inc
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.inc *= 1e-100
+            self.order = [(-self.activity[u], u) for u in range(1, len(self.assign)) if not self.assign[u]]
+            heapq.heapify(self.order)
+        elif not self.assign[v]:
+            heapq.heappush(self.order, (-self.activity[v], v))
+
+    def analyze(self, ci):
+        # first-UIP learnt clause with the asserting literal first and the
+        # literal of the backjump level second
+        level = len(self.limits)
+        learnt, seen, pending = [None], set(), 0
+        c, p, i = self.clauses[ci], None, len(self.trail) - 1
+        while True:
+            for q in (c if p is None else c[1:]):
+                v = abs(q)
+                if v not in seen and self.level[v] > 0:
+                    seen.add(v)
+                    self.bump(v)
+                    if self.level[v] == level:
+                        pending += 1
+                    else:
+                        learnt.append(q)
+            while abs(self.trail[i]) not in seen:
+                i -= 1
+            p = self.trail[i]
+            i -= 1
+            pending -= 1
+            if not pending:
+                break
+            c = self.clauses[self.reason[abs(p)]]
+        learnt[0] = -p
+        self.inc /= 0.95
+
+        if len(learnt) == 1:
+            return learnt, 0
+        k = max(range(1, len(learnt)), key=lambda k: self.level[abs(learnt[k])])
+        learnt[1], learnt[k] = learnt[k], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def backjump(self, level):
+        if len(self.limits) <= level:
+            return
+        for l in self.trail[self.limits[level]:]:
+            v = abs(l)
+            self.phase[v] = self.assign[v]
+            self.assign[v] = 0
+            self.reason[v] = None
+            heapq.heappush(self.order, (-self.activity[v], v))
+        del self.trail[self.limits[level]:]
+        del self.limits[level:]
+        self.head = len(self.trail)
+
+    def decide(self):
+        while self.order:
+            v = heapq.heappop(self.order)[1]
+            if not self.assign[v]:
+                return v * self.phase[v]
+        return None
+
+    def solve(self, assumptions=()):
+        if not self.ok:
+            return False
+        self.grow(max((abs(l) for l in assumptions), default=0))
+        self.backjump(0)
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if not self.limits:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backjump(level)
+                self.enqueue(learnt[0], self.attach(learnt) if len(learnt) > 1 else None)
+                continue
+            if len(self.limits) < len(assumptions):
+                l = assumptions[len(self.limits)]
+                if self.value(l) == -1:
+                    return False
+                self.limits.append(len(self.trail))
+                self.enqueue(l, None)
+                continue
+            l = self.decide()
+            if l is None:
+                return True
+            self.limits.append(len(self.trail))
+            self.enqueue(l, None)
+
+
+def satisfiable(clauses, assumptions=()):
+    return Solver(clauses).solve(assumptions)
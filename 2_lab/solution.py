@@ -1,70 +1,336 @@
 import argparse
-import copy
-from literal import Literal
-from clause import Clause
+import heapq
+import multiprocessing
+import resource
+from clause import Clause, ClauseSet, pack, unpack
+from knowledge import KnowledgeBase
+from sat import Solver
 import time
-import itertools
+from collections import Counter
 
 parser = argparse.ArgumentParser()
 subparsers = parser.add_subparsers(dest="command")
 
 res_parser = subparsers.add_parser("resolution")
 res_parser.add_argument("claus_path")
+res_parser.add_argument("--engine", default="resolution", choices=["resolution", "sat"],
+                        help="prover; only resolution prints a proof")
+
+res_parser.add_argument("--stats", action="store_true",
+                        help="print search statistics")
 
 cook_parser = subparsers.add_parser("cooking")
 cook_parser.add_argument("claus_path")
 cook_parser.add_argument("us_cmd_path")
+cook_parser.add_argument("--flush-every", type=int, default=100,
+                         help="knowledge base edits written back to claus_path at a time")
+cook_parser.add_argument("--engine", default="resolution", choices=["resolution", "sat"],
+                         help="prover; only resolution prints a proof")
+cook_parser.add_argument("--jobs", type=int, default=1,
+                         help="worker processes answering the queries between two edits")
+
+for p in (res_parser, cook_parser):
+    p.add_argument("--pick-ratio", type=int, default=5,
+                   help="shortest clauses picked per oldest one (0: always the shortest)")
+    p.add_argument("--max-seconds", type=float,
+                   help="give up a resolution search after this many seconds")
+    p.add_argument("--max-clauses", type=int,
+                   help="give up a resolution search after generating this many clauses")
+    p.add_argument("--max-memory", type=int, metavar="MB",
+                   help="give up a resolution search once the process grows past this size")
+
+# counters kept by resolution, in report order, and the stages it profiles
+STATS = ("given", "pairs", "generated", "kept", "tautologies", "subsumed", "retired")
+STAGES = ("selection", "resolution", "redundancy")
+
+
+class SearchLimit(Exception):
+    # a resolution search hit one of its limits; args are (limit, stats)
+    pass
+
+
+class GivenQueue:
+    # Clauses waiting to be given. The shortest one goes first, the oldest
+    # among equals, so units are preferred; every ratio + 1-th pick takes
+    # the oldest clause instead so long clauses are not starved. Both heaps
+    # hold every clause and picked ones are skipped lazily.
+    def __init__(self, ratio=5):
+        self.by_weight = []
+        self.by_age = []
+        self.ratio = ratio
+        self.picks = 0
+        self.age = 0
+        self.picked = set()
+
+    def __len__(self):
+        return self.age - len(self.picked)
+
+    def push(self, clause):
+        heapq.heappush(self.by_weight, (len(clause.get_literals()), self.age, clause))
+        if self.ratio:
+            heapq.heappush(self.by_age, (self.age, clause))
+        self.age += 1
+
+    def pop(self):
+        self.picks += 1
+        heap = self.by_weight
+        if self.ratio and self.picks % (self.ratio + 1) == 0:
+            heap = self.by_age
+        while True:
+            entry = heapq.heappop(heap)
+            if entry[-2] not in self.picked:
+                self.picked.add(entry[-2])
+                return entry[-1]
+
+
+def resolution(goal, initial, base=None, pick_ratio=5, limits=None, stats=None, profile=None):
+    # given-clause loop over the set of support: each clause taken from the
+    # queue is resolved against every usable clause holding a complementary
+    # literal, then becomes usable itself. kept holds every live clause and
+    # is what new clauses are checked against for subsumption. base is the
+    # (kept, usable) pair of the reduced initial clauses; the query works on
+    # sets layered over it, so it can be shared between queries. limits maps
+    # seconds, clauses and memory (MB) to bounds that raise SearchLimit.
+    # profile, if given, collects the seconds spent in each of STAGES.
+    stats = Counter() if stats is None else stats
+    start = time.perf_counter()
+    queue = GivenQueue(pick_ratio)
+    select, resolve_, keep_, reduce_ = queue.pop, resolve, keep, reduce
+    if profile is not None:
+        select = timed(select, profile, "selection")
+        resolve_ = timed(resolve_, profile, "resolution")
+        keep_ = timed(keep_, profile, "redundancy")
+        reduce_ = timed(reduce_, profile, "redundancy")
+
+    kb_kept, kb_usable = base if base is not None else reduce_(initial)
+    kept, usable = ClauseSet(kb_kept), ClauseSet(kb_usable)
+    for c in sorted(goal.negate()):
+        if c in kept or keep_(kept, usable, c):
+            queue.push(c)
+
+    while queue:
+        given = select()
+        if given not in kept:
+            continue
+        stats["given"] += 1
+        if limits:
+            check_limits(limits, stats, start)
+        for l in given.get_literals():
+            for c in usable.containing(-l):
+                if c not in usable:
+                    continue
+                stats["pairs"] += 1
+                if len(given.get_literals()) == 1 and len(c.get_literals()) == 1:
+                    return True, Clause(goal.get_literals(), (given, c)), initial
+                if limits and limits.get("clauses") is not None and stats["generated"] >= limits["clauses"]:
+                    raise SearchLimit("clauses", stats)
+                res = resolve_(given, c)
+                stats["generated"] += 1
+                if keep_(kept, usable, res, stats):
+                    queue.push(res)
+            if given not in kept:
+                break
+        else:
+            usable.add(given)
+    return False, goal, initial
 
 
-def resolution(goal, initial):
-
-    clauses = copy.deepcopy(initial)
-    resolved = set()
-    sos = goal.negate()
-
-    while True:
-        remove_redundant(clauses, sos)
-        remove_tautologies(clauses, sos)
-
-        selected = select_clauses(clauses, sos, resolved)
-        if selected is None:
-            return False, goal, initial
-
-        c1, c2 = selected
-        if len(c1.get_literals()) == 1 and len(c2.get_literals()) == 1:
-            return True, Clause(goal.get_literals(), (c1, c2)), initial
-        res = resolve(c1, c2)
-        resolved |= {(c1, c2), (c2, c1)}
-        sos.add(res)
-
-
-def remove_redundant(clauses, sos):
-    [clauses.remove(c) for c in set(clauses) if c.isRedundant(clauses | sos)]
-    [sos.remove(c) for c in set(sos) if c.isRedundant(clauses | sos)]
+def timed(fn, profile, stage):
+    def run(*args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            profile[stage] += time.perf_counter() - start
+    return run
 
 
-def remove_tautologies(clauses, sos):
-    [clauses.remove(c) for c in set(clauses) if c.isResolvable(c)]
-    [sos.remove(c) for c in set(sos) if c.isResolvable(c)]
+def check_limits(limits, stats, start):
+    if limits.get("seconds") is not None and time.perf_counter() - start > limits["seconds"]:
+        raise SearchLimit("seconds", stats)
+    if limits.get("memory") is not None and stats["given"] % 64 == 0 and rss() > 2 ** 20 * limits["memory"]:
+        raise SearchLimit("memory", stats)
 
 
-def select_clauses(clauses, sos, res):
-    pairs = set(itertools.product(sos, sos | clauses)) - res
-    for c1, c2 in pairs:
-        if c1 != c2 and c1.isResolvable(c2):
-            return (c1, c2)
+def rss():
+    # current resident set size in bytes; ru_maxrss is the peak over the
+    # whole process, so it is only the fallback where /proc is missing
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def sat(goal, initial, solver=None):
+    # the knowledge base entails goal iff it is unsatisfiable under the
+    # negated goal; there is no proof, so goal comes back without parents.
+    # solver may be one already built over initial.
+    if solver is None:
+        solver = Solver(c.get_literals() for c in initial)
+    assumptions = [-l for l in sorted(goal.get_literals())]
+    return not solver.solve(assumptions), goal, initial
+
+
+def reduce(clauses):
+    kept, usable = ClauseSet(), ClauseSet()
+    for c in sorted(clauses):
+        if keep(kept, usable, c):
+            usable.add(c)
+    return kept, usable
+
+
+def proof_leaves(goal):
+    # clauses without parents that the proof of goal rests on
+    leaves, stack = set(), list(goal.get_parents())
+    while stack:
+        c = stack.pop()
+        if c.get_parents() is None:
+            leaves.add(c)
+        else:
+            stack.extend(c.get_parents())
+    return leaves
+
+
+class QueryCache:
+    # Answers of earlier queries keyed by the negated goal, together with the
+    # reduced knowledge base they ran against, both kept valid for the
+    # knowledge base version in self.version. Adding a clause can only turn
+    # unknown answers into true ones and removing one can only break the
+    # proofs that used it, so an edit drops just those entries. Answers the
+    # sat engine found true have no proof and are filed under None, as
+    # resting on every clause. Searches stopped by a limit are remembered
+    # until the next edit. search holds the keyword arguments of resolution.
+    def __init__(self, kb, engine="resolution", search=None):
+        self.kb = kb
+        self.engine = engine
+        self.search = search or {}
+        self.limited = {}
+        self.version = kb.version
+        self.base = None
+        self.solver = None
+        self.results = {}
+        self.uses = {}
+        kb.listeners.append(self.changed)
+
+    def changed(self, clause, added):
+        self.version = self.kb.version
+        self.solver = None
+        self.limited.clear()
+        if added:
+            for key in [k for k, (found, _) in self.results.items() if not found]:
+                del self.results[key]
+            if self.base is not None and keep(*self.base, clause):
+                self.base[1].add(clause)
+        else:
+            for key in self.uses.pop(clause, set()) | self.uses.pop(None, set()):
+                self.results.pop(key, None)
+            if self.base is not None and clause in self.base[0]:
+                self.base = None
+
+    def __contains__(self, goal):
+        return goal.get_literals() in self.results or goal.get_literals() in self.limited
+
+    def prepare(self):
+        if self.engine == "sat" and self.solver is None:
+            self.solver = Solver(c.get_literals() for c in self.kb.clauses())
+        elif self.engine != "sat" and self.base is None:
+            self.base = reduce(self.kb.clauses())
+
+    def solve(self, goal):
+        self.prepare()
+        if self.engine == "sat":
+            found, proof, _ = sat(goal, self.kb.clauses(), self.solver)
+        else:
+            found, proof, _ = resolution(goal, self.kb.clauses(), self.base, **self.search)
+        return found, proof
+
+    def store(self, goal, found, proof):
+        key = goal.get_literals()
+        self.results[key] = found, proof
+        if found and proof.get_parents() is None:
+            self.uses.setdefault(None, set()).add(key)
+        elif found:
+            negated_goal = goal.negate()
+            for c in proof_leaves(proof):
+                if c not in negated_goal:
+                    self.uses.setdefault(c, set()).add(key)
+
+    def query(self, goal):
+        if goal not in self:
+            try:
+                self.store(goal, *self.solve(goal))
+            except SearchLimit as e:
+                self.limited[goal.get_literals()] = e
+        if goal.get_literals() in self.limited:
+            raise self.limited[goal.get_literals()]
+        found, proof = self.results[goal.get_literals()]
+        return found, proof, self.kb.clauses()
+
+
+# The cache of the cooking run; forked workers answer queries from their copy.
+context = {}
+
+
+def answer(line):
+    try:
+        found, proof = context["cache"].solve(Clause.parse(line))
+    except SearchLimit as e:
+        return None, e.args
+    return found, pack(proof)
+
+
+def prefetch(cache, commands, start, jobs):
+    # answers the queries from start up to the next edit in a pool forked
+    # with the knowledge base as it is now and stores them in the cache;
+    # returns where the run ends
+    end = start
+    while end < len(commands) and commands[end][1] == "?":
+        end += 1
+    goals = {}
+    for clause, _ in commands[start:end]:
+        goal = Clause.parse(clause)
+        if goal not in cache:
+            goals.setdefault(goal.get_literals(), (goal, clause))
+    if len(goals) > 1:
+        cache.prepare()
+        context["cache"] = cache
+        lines = [clause for _, clause in goals.values()]
+        with multiprocessing.get_context("fork").Pool(min(jobs, len(goals))) as pool:
+            for (goal, _), (found, res) in zip(goals.values(), pool.map(answer, lines, chunksize=1)):
+                if found is None:
+                    cache.limited[goal.get_literals()] = SearchLimit(*res)
+                else:
+                    cache.store(goal, found, unpack(res))
+    return end
+
+
+def keep(kept, usable, clause, stats=None):
+    # tautologies and clauses subsumed by a kept one are dropped; a clause
+    # that is kept retires every clause it subsumes
+    stats = Counter() if stats is None else stats
+    if clause.isTautology():
+        stats["tautologies"] += 1
+        return False
+    if kept.subsumes(clause):
+        stats["subsumed"] += 1
+        return False
+    for c in kept.subsumed_by(clause):
+        stats["retired"] += 1
+        kept.remove(c)
+        if c in usable:
+            usable.remove(c)
+    stats["kept"] += 1
+    kept.add(clause)
+    return True
 
 
 def resolve(c1, c2):
-    new = set()
-    c2_cp = copy.deepcopy(c2.get_literals())
+    # resolves on a single complementary pair; any other pair leaves a
+    # tautology, which keep drops
     for l in c1.get_literals():
-        neg_l = l.negate()
-        if neg_l in c2.get_literals():
-            c2_cp.remove(neg_l)
-        else:
-            new.add(l)
-    return Clause(new | c2_cp, (c1, c2))
+        if -l in c2.get_literals():
+            return Clause((c1.get_literals() - {l}) | (c2.get_literals() - {-l}), (c1, c2))
 
 
 def parse_res_file(path):
@@ -75,14 +341,7 @@ def parse_res_file(path):
                 for line in file.readlines()
                 if not line.startswith("#")
             ]
-            clauses = []
-            for l in data:
-                literals = [
-                    Literal(literal.replace("~", ""), literal.startswith("~"))
-                    for literal in l.lower().split()
-                    if literal != "v"
-                ]
-                clauses.append(Clause(literals, None))
+            clauses = [Clause.parse(l) for l in data]
             return data, clauses[-1], set(clauses[:-1])
     except OSError:
         print("State space descriptor file path does not exist.")
@@ -97,54 +356,62 @@ def parse_cmd_file(path):
     return commands
 
 
-def cooking(commands, data):
+def cooking(commands, kb, engine="resolution", jobs=1, search=None):
     print("Constructed with knowledge:")
-    [print(line.lower().rstrip("\n")) for line in data]
+    [print(line.lower()) for line in kb.data()]
     print()
 
-    for clause, cmd in commands:
-        print("User's command:", clause, cmd)
-
-        if cmd == "?":
-            literals = [
-                Literal(literal.replace("~", ""), literal.startswith("~"))
-                for literal in clause.lower().split()
-                if literal != "v"
-            ]
-            goal, initial = parse_res_file(args.claus_path)[1:]
-            initial.add(goal)
-            found, goal, clauses = resolution(Clause(literals, None), initial)
-            print_res(found, goal, clauses)
-
-        elif cmd == "-":
-            with open(args.claus_path, "r+") as file:
-                cl_data = [line.lower().rstrip("\n") for line in file.readlines()]
-                if clause in cl_data:
-                    file.seek(0)
-                    cl_data.remove(clause)
-                    file.write("\n".join(cl_data) + "\n")
+    cache = QueryCache(kb, engine, search)
+    ahead = 0
+    try:
+        for i, (clause, cmd) in enumerate(commands):
+            print("User's command:", clause, cmd)
+
+            if cmd == "?":
+                if jobs > 1 and i >= ahead:
+                    ahead = prefetch(cache, commands, i, jobs)
+                goal = Clause.parse(clause)
+                try:
+                    found, goal, clauses = cache.query(goal)
+                    print_res(found, goal, clauses)
+                except SearchLimit as e:
+                    print_res(False, goal, kb.clauses(), *e.args)
+
+            elif cmd == "-":
+                if kb.remove(clause):
                     print("removed", clause)
-                    file.truncate()
                 else:
                     print(clause, "not present in database")
 
-        elif cmd == "+":
-            with open(args.claus_path, "a") as file:
-                file.write(clause + "\n")
-            print("added", clause)
+            elif cmd == "+":
+                kb.add(clause)
+                print("added", clause)
 
-        print()
+            print()
+    finally:
+        kb.flush()
 
 
-def print_res(found, goal, clauses):
-    if found:
+def print_res(found, goal, clauses, limit=None, stats=None):
+    # a goal found true without parents was decided by the sat engine and
+    # has no proof to print
+    if found and goal.get_parents() is not None:
         print_fun(goal, clauses)
-    else:
+    elif not found:
         print_init(clauses, goal.negate(), None)
+    if stats is not None:
+        print_stats(stats, limit)
     print("[CONCLUSION]: ", end="")
     print(f"{goal} is true") if found else print(f"{goal} is unknown")
 
 
+def print_stats(stats, limit=None):
+    report = ", ".join(f"{k}={stats[k]}" for k in STATS)
+    if limit is not None:
+        report = f"stopped by {limit} limit, " + report
+    print(f"[STATS]: {report}")
+
+
 def print_fun(goal, clauses):
     used = [goal]
     parents = []
@@ -192,10 +459,25 @@ def print_init(clauses, goal, clause_line):
 
 if __name__ == "__main__":
     args = parser.parse_args()
-    data, goal, initial = parse_res_file(args.claus_path)
+    search = {"pick_ratio": args.pick_ratio,
+              "limits": {"seconds": args.max_seconds, "clauses": args.max_clauses,
+                         "memory": args.max_memory}}
     if args.command == "resolution":
-        found, goal, clauses = resolution(goal, initial)
-        print_res(found, goal, clauses)
+        data, goal, initial = parse_res_file(args.claus_path)
+        if args.engine == "sat":
+            print_res(*sat(goal, initial))
+        else:
+            stats = Counter()
+            try:
+                found, goal, clauses = resolution(goal, initial, **search, stats=stats)
+                print_res(found, goal, clauses, stats=stats if args.stats else None)
+            except SearchLimit as e:
+                print_res(False, goal, initial, *e.args)
     elif args.command == "cooking":
+        try:
+            kb = KnowledgeBase(args.claus_path, args.flush_every)
+        except OSError:
+            print("State space descriptor file path does not exist.")
+            exit(1)
         commands = parse_cmd_file(args.us_cmd_path)
-        cooking(commands, data)
+        cooking(commands, kb, args.engine, args.jobs, search)
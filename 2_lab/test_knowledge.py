@@ -0,0 +1,21 @@
+from knowledge import KnowledgeBase
+
+
+def test_flush_keeps_case_and_ends_lines(tmp_path):
+    path = tmp_path / "kb.txt"
+    path.write_text("A v B\n~C v d\ne", encoding="utf8")
+    kb = KnowledgeBase(str(path))
+    kb.add("f v G")
+    assert kb.remove("~c v d")
+    kb.flush()
+    assert path.read_text(encoding="utf8") == "A v B\ne\nf v G\n"
+
+
+def test_flush_every(tmp_path):
+    path = tmp_path / "kb.txt"
+    path.write_text("a\n", encoding="utf8")
+    kb = KnowledgeBase(str(path), flush_every=2)
+    kb.add("b")
+    assert path.read_text(encoding="utf8") == "a\n"
+    kb.add("c")
+    assert path.read_text(encoding="utf8") == "a\nb\nc\n"
@@ -1,23 +1,30 @@
 import math
 import argparse
 import csv
-from collections import Counter, defaultdict, deque
-import itertools
-import copy
-import imaplib
+from collections import deque
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
 
 parser = argparse.ArgumentParser()
 parser.add_argument("train", metavar="train_path", nargs=1)
 parser.add_argument("test", metavar="test_path", nargs=1)
 parser.add_argument("d", metavar="tree_depth", nargs="*")
+parser.add_argument("--jobs", type=int, default=1,
+                    help="worker processes used to grow the tree")
 
 
 class Node:
-    def __init__(self, attr=None, subtrees=None, value=None, data=None):
+    # A node keeps the label counts of the training rows that reached it and
+    # their majority label, not the rows themselves; inner nodes answer with
+    # the majority when an instance has a value no branch was grown for.
+    __slots__ = ("__attr", "__subtrees", "__value", "__counts")
+
+    def __init__(self, attr=None, subtrees=None, value=None, counts=None):
         self.__attr = attr
         self.__subtrees = subtrees
         self.__value = value
-        self.__data = data
+        self.__counts = counts
 
     @property
     def subtrees(self):
@@ -32,120 +39,298 @@ class Node:
         return self.__value
 
     @property
-    def data(self):
-        return self.__data
+    def counts(self):
+        return self.__counts
 
     def is_leaf(self):
-        return self.__value != None
+        return self.__subtrees is None
+
+
+class FlatTree:
+    # A fitted tree compiled to parallel arrays over nodes numbered breadth
+    # first: the attribute a node splits on (-1 for leaves), its majority
+    # label and the offset of its row in the flat child table. A row holds
+    # the child for every value of the attribute known to the tree, plus a
+    # last slot for unknown values; a missing child is -1 and makes the row
+    # stop at the node and take its majority label.
+    def __init__(self, tree, classes):
+        self.classes = list(classes)
+        self.attrs = sorted({n.attr for n in walk(tree) if not n.is_leaf()})
+        self.vocab = {a: {} for a in self.attrs}
+        for n in walk(tree):
+            if not n.is_leaf():
+                for val in n.subtrees:
+                    self.vocab[n.attr].setdefault(val, None)
+        self.vocab = {a: {val: i for i, val in enumerate(sorted(vals))} for a, vals in self.vocab.items()}
+
+        nodes = list(walk(tree))
+        ids = {id(n): i for i, n in enumerate(nodes)}
+        label = {c: i for i, c in enumerate(self.classes)}
+        self.feature = np.full(len(nodes), -1, dtype=np.intp)
+        self.label = np.array([label[n.value] for n in nodes], dtype=np.intp)
+        self.offset = np.zeros(len(nodes), dtype=np.intp)
+        children = []
+        for i, n in enumerate(nodes):
+            if n.is_leaf():
+                continue
+            vocab = self.vocab[n.attr]
+            self.feature[i] = self.attrs.index(n.attr)
+            self.offset[i] = len(children)
+            row = [-1] * (len(vocab) + 1)
+            for val, child in n.subtrees.items():
+                row[vocab[val]] = ids[id(child)]
+            children.extend(row)
+        self.children = np.array(children, dtype=np.intp)
+
+    def encode(self, dataset):
+        # the dataset's columns recoded to the tree's value numbering
+        X = np.empty((len(dataset), len(self.attrs)), dtype=np.intp)
+        for k, a in enumerate(self.attrs):
+            vocab = self.vocab[a]
+            j = dataset.header.index(a)
+            lut = np.array([vocab.get(val, len(vocab)) for val in dataset.values[j]], dtype=np.intp)
+            X[:, k] = lut[dataset.codes[:, j]]
+        return X
+
+    def predict(self, dataset):
+        # label codes for every row, routing all rows one level per step
+        X = self.encode(dataset)
+        node = np.zeros(len(dataset), dtype=np.intp)
+        rows = np.arange(len(dataset))
+        while len(rows):
+            at = node[rows]
+            inner = self.feature[at] >= 0
+            rows, at = rows[inner], at[inner]
+            child = self.children[self.offset[at] + X[rows, self.feature[at]]]
+            moved = child >= 0
+            rows = rows[moved]
+            node[rows] = child[moved]
+        return self.label[node]
+
+
+def walk(tree):
+    # nodes breadth first
+    queue = deque([tree])
+    while queue:
+        node = queue.popleft()
+        yield node
+        if not node.is_leaf():
+            queue.extend(node.subtrees.values())
+
+
+class Dataset:
+    # A csv file in columnar form: column j of codes holds indices into
+    # values[j], the sorted distinct values of that column. The last column
+    # is the label.
+    def __init__(self, header, values, codes):
+        self.header = header
+        self.values = values
+        self.codes = codes
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    def column(self, name):
+        return self.codes[:, self.header.index(name)]
 
 
 class ID3:
-    def __init__(self, max_depth=None):
+    def __init__(self, max_depth=None, n_jobs=1, min_rows=1000):
+        # nodes with fewer than min_rows rows are grown and scored in the
+        # calling process
         self.__model = None
         self.__max_depth = max_depth
+        self.__n_jobs = n_jobs
+        self.__min_rows = min_rows
 
     def fit(self, train_set):
         if len(train_set) == 0:
             exit("Train set is empty.")
-        attrs = list(train_set[0].keys())
-        D = train_set
-        D_parent = train_set
-        X = sorted(attrs[:-1])
-        y = attrs[-1]
-        self.__model = self.id3(D=D, D_parent=D_parent, X=X, y=y)
+        X = tuple(sorted(train_set.header[:-1]))
+        y = train_set.header[-1]
+        self.__model = self.id3(train_set, X=X, y=y)
+        self.__flat = FlatTree(self.__model, train_set.values[-1])
         return self.__model
 
     def predict(self, test_set):
-        goal = list(test_set[0].keys())[-1]
-        print("[PREDICTIONS]:", end=" ")
-        node = self.__model
-        correct = 0
-        exp_values = []
-        pred_values = []
-
-        for inst in test_set:
-            expected = inst[goal]
-            exp_values.append(expected)
-            predicted = self.predict_inst(node, inst)
-            pred_values.append(predicted)
-            if predicted == expected:
-                correct += 1
-            print(predicted, end=" ")
-
-        print(f"\n[ACCURACY]: {accuracy(correct, len(test_set)):0.5f}")
+        classes = self.__flat.classes
+        goal = test_set.values[-1]
+        labels = sorted(set(classes) | set(goal))
+        code = {c: i for i, c in enumerate(labels)}
+        predicted = np.array([code[c] for c in classes], dtype=np.intp)[self.__flat.predict(test_set)]
+        expected = np.array([code[c] for c in goal], dtype=np.intp)[test_set.codes[:, -1]]
+
+        print("[PREDICTIONS]: " + "".join(labels[c] + " " for c in predicted.tolist()))
+        print(f"[ACCURACY]: {accuracy(int(np.count_nonzero(predicted == expected)), len(test_set)):0.5f}")
         print(f"[CONFUSION_MATRIX]:")
-        matrix = conf_matrix(exp_values, pred_values)
+        matrix = conf_matrix(expected, predicted, len(labels))
         [print(" ".join(map(str, row))) for row in matrix]
 
-    def predict_inst(self, node: Node, instance):
-        if node.is_leaf():
-            return node.value
-        val = instance[node.attr]
-        found = 0
-        attr_values = list(node.subtrees.keys())
-        if val in attr_values:
-            return self.predict_inst(node.subtrees[val], instance)
-        else:
-            return argmax(node.data)
-
-    def id3(self, D, D_parent, X, y, depth=0):
-        if not D:
-            v = argmax(D_parent)
-            return Node(value=v)
-
-        v = argmax(D)
-        D_yv = [inst for inst in D if inst[y] == v]
-
-        if not X or D == D_yv or depth == self.__max_depth:
-            return Node(value=v)
-
-        ent = entropy([inst[y] for inst in D])
-        max_ig, max_x = 0, X[0]
-        igs = []
-        for x in X:
-            ig = IG(D, x, ent, y)
-            print(f"IG({x})={ig:.4f}", end=" ")
-            if ig > max_ig:
-                max_ig = ig
-                max_x = x
-        print()
-
-        subtrees = {}
-        x_vals = set([inst[max_x] for inst in D])
-        for x_val in x_vals:
-            D_xv = [inst for inst in D if inst[max_x] == x_val]
-            new_X = copy.deepcopy(X)
-            new_X.remove(max_x)
-            t = self.id3(D_xv, D, new_X, y, depth=depth + 1)
-            subtrees.update({x_val: t})
-
-        return Node(attr=max_x, subtrees=subtrees, data=D)
-
-
-def IG(data, x, ent, y):
+    def id3(self, data, X, y):
+        # With n_jobs > 1 the row index array lives in shared memory and a
+        # pool is forked over it: large nodes score their attributes in the
+        # pool, and subtrees of at most 1/n_jobs of the rows are grown by a
+        # worker. IG lines are collected in the order the serial growth
+        # prints them and the results slot back into the same places, so
+        # the tree and the output do not depend on n_jobs.
+        n = len(data)
+        if self.__n_jobs <= 1:
+            log = []
+            tree = self.grow(data, np.arange(n), y, 0, n, None, X, 0, log)
+            [print(line) for line in log]
+            return tree
+
+        shm = shared_memory.SharedMemory(create=True, size=max(n, 1) * np.dtype(np.intp).itemsize)
+        try:
+            index = np.ndarray(n, dtype=np.intp, buffer=shm.buf)
+            index[:] = np.arange(n)
+            context.update(model=self, data=data, index=index, y=y)
+            with multiprocessing.get_context("fork").Pool(self.__n_jobs) as pool:
+                log = []
+                tree = self.grow(data, index, y, 0, n, None, X, 0, log, pool)
+                for line in log:
+                    if isinstance(line, str):
+                        print(line)
+                        continue
+                    subtrees, key, task = line
+                    nodes, lines = task.get()
+                    subtrees[key] = unpack(nodes)
+                    [print(line) for line in lines]
+            return tree
+        finally:
+            context.clear()
+            index = None
+            try:
+                shm.close()
+            except BufferError:
+                # the traceback of a failed grow still holds views of the
+                # index; the mapping is released with them
+                pass
+            shm.unlink()
+
+    def grow(self, data, index, y, lo, hi, parent, X, depth, log, pool=None):
+        # Grows the tree depth first from an explicit stack. Every node owns
+        # a slice of the index array; a split stably reorders the slice by
+        # the split attribute, so each child gets a contiguous slice with
+        # its rows still in file order, which keeps the IG sums unchanged.
+        labels = data.column(y)
+        classes = data.values[-1]
+        root = {}
+        stack = [(lo, hi, parent, X, depth, root, None)]
+        while stack:
+            lo, hi, parent, X, depth, subtrees, key = stack.pop()
+            if pool is not None and key is not None and self.__min_rows <= hi - lo <= len(index) / self.__n_jobs:
+                subtrees[key] = None
+                log.append((subtrees, key, pool.apply_async(subtree, (lo, hi, parent, X, depth))))
+                continue
+
+            D = index[lo:hi]
+            if not len(D):
+                subtrees[key] = Node(value=classes[parent], counts=np.zeros(len(classes), dtype=np.intp))
+                continue
+
+            counts = np.bincount(labels[D], minlength=len(classes))
+            # label codes follow sorted label order, so ties go to the smallest
+            v = int(np.argmax(counts))
+
+            if not X or counts[v] == len(D) or depth == self.__max_depth:
+                subtrees[key] = Node(value=classes[v], counts=counts)
+                continue
+
+            ent = entropy(first_counts(labels[D]))
+            if pool is not None and len(D) >= self.__min_rows:
+                igs = pool.starmap(score, [(lo, hi, x, ent) for x in X])
+            else:
+                igs = [IG(data, D, x, ent, y) for x in X]
+            max_ig, max_x = 0, X[0]
+            for x, ig in zip(X, igs):
+                if ig > max_ig:
+                    max_ig = ig
+                    max_x = x
+            log.append("".join(f"IG({x})={ig:.4f} " for x, ig in zip(X, igs)))
+
+            column = data.column(max_x)
+            D[:] = D[np.argsort(column[D], kind="stable")]
+            x_vals, sizes = np.unique(column[D], return_counts=True)
+            ends = lo + np.cumsum(sizes)
+            new_X = tuple(x for x in X if x != max_x)
+            node = Node(attr=max_x, subtrees={}, value=classes[v], counts=counts)
+            subtrees[key] = node
+            names = data.values[data.header.index(max_x)]
+            for x_val, end, size in reversed(list(zip(x_vals, ends, sizes))):
+                stack.append((end - size, end, v, new_X, depth + 1, node.subtrees, names[x_val]))
+
+        return root[None]
+
+
+# The growth state shared with forked workers.
+context = {}
+
+
+def score(lo, hi, x, ent):
+    return IG(context["data"], context["index"][lo:hi], x, ent, context["y"])
+
+
+def subtree(lo, hi, parent, X, depth):
+    log = []
+    tree = context["model"].grow(context["data"], context["index"], context["y"], lo, hi, parent, X, depth, log)
+    return pack(tree), log
+
+
+def pack(tree):
+    # the tree as a flat preorder list, so deep trees pickle without recursing
+    nodes, stack = [], [(tree, None, None)]
+    while stack:
+        node, parent, key = stack.pop()
+        nodes.append((node.attr, node.value, node.counts, parent, key))
+        if not node.is_leaf():
+            stack.extend((child, len(nodes) - 1, val) for val, child in reversed(node.subtrees.items()))
+    return nodes
+
+
+def unpack(nodes):
+    built = []
+    for attr, value, counts, parent, key in nodes:
+        node = Node(attr=attr, subtrees=None if attr is None else {}, value=value, counts=counts)
+        if parent is not None:
+            built[parent].subtrees[key] = node
+        built.append(node)
+    return built[0]
+
+
+def contingency(values, labels):
+    # The (value, label) table of a subset: the counts of every pair that
+    # occurs, ordered by where the pair first occurs. Entropies are summed
+    # in that order, the order a row-by-row scan meets them in, so the
+    # floating point results do not change with the encoding.
+    k = int(labels.max()) + 1
+    pairs, first, counts = np.unique(values * k + labels, return_index=True, return_counts=True)
+    order = np.argsort(first, kind="stable")
+    return (pairs[order] // k).tolist(), counts[order].tolist()
+
+
+def first_counts(labels):
+    # label counts in order of first occurrence
+    return contingency(np.zeros_like(labels), labels)[1]
+
+
+def IG(data, D, x, ent, y):
     vals = {}
-    for row in data:
-        key = row[x]
-        if key not in list(vals.keys()):
-            vals[key] = [row[y]]
-        else:
-            vals[key].extend([row[y]])
+    for key, count in zip(*contingency(data.column(x)[D], data.column(y)[D])):
+        vals.setdefault(key, []).append(count)
 
     sum = 0
-    for key, value in vals.items():
-        sum += entropy(value) * len(value) / len(data)
+    for key, counts in vals.items():
+        sum += entropy(counts) * math.fsum(counts) / len(D)
     return ent - sum
 
 
-def entropy(values):
-    length = len(values)
+def entropy(counts):
+    length = int(np.sum(counts))
     if length <= 1:
         return 0
 
-    count = Counter()
-    for d in values:
-        count[d] += 1
-    probs = [float(c) / length for c in count.values()]
+    probs = [float(c) / length for c in counts]
 
     sum = 0
     for p in probs:
@@ -154,33 +339,29 @@ def entropy(values):
     return sum
 
 
-def argmax(data):
-    classes = []
-    key = list(data[0].keys())[-1]
-    for row in data:
-        classes.append(row[key])
-    return Counter(sorted(classes)).most_common(1)[0][0]
-
-
 def accuracy(corrects, length):
     return corrects / length
 
 
-def conf_matrix(expected, predicted):
-    classes = sorted(set(expected))
-    num = len(classes)
-    m = [[0] * num for i in range(num)]
-    map_label = {key: i for i, key in enumerate(classes)}
-    for pred, exp in zip(predicted, expected):
-        m[map_label[exp]][map_label[pred]] += 1
-    return m
+def conf_matrix(expected, predicted, num):
+    # rows and columns are the labels that occur in either array
+    m = np.bincount(expected * num + predicted, minlength=num * num).reshape(num, num)
+    used = np.flatnonzero(m.any(axis=0) | m.any(axis=1))
+    return m[np.ix_(used, used)].tolist()
 
 
 def parse(path):
-    data = []
-    with open(path, "r", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        return list(reader)
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        rows = [row for row in reader if row]
+
+    values = []
+    codes = np.empty((len(rows), len(header)), dtype=np.intp, order="F")
+    for j, column in enumerate(zip(*rows)):
+        uniq, codes[:, j] = np.unique(np.array(column), return_inverse=True)
+        values.append(uniq.tolist())
+    return Dataset(header, values, codes)
 
 
 def print_result(tree):
@@ -214,7 +395,7 @@ if __name__ == "__main__":
     if args.d:
         depth = int(args.d[0])
 
-    model = ID3(max_depth=depth)
+    model = ID3(max_depth=depth, n_jobs=args.jobs)
     tree = model.fit(train_set)
     print_result(tree)
 